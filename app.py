@@ -2,6 +2,8 @@ import streamlit as st
 import os.path as osp
 
 from web_utils.connection import GoogleDriveManager
+from database_operations.federation import FEDERATION_PATH
+from web_utils.data_loading import check_schema
 
 pages = {
     "Performance reports" : [
@@ -13,6 +15,9 @@ pages = {
 pg = st.navigation(pages)
 
 if not 'local_save_path' in st.session_state:
-    st.session_state['local_save_path'] = osp.join('data','gps_data.db')
+    # The seasons of the federation file when there is one, the single database otherwise
+    st.session_state['local_save_path'] = FEDERATION_PATH if osp.isfile(FEDERATION_PATH) else osp.join('data','gps_data.db')
+
+check_schema(st.session_state['local_save_path'])
 
 pg.run()
\ No newline at end of file
@@ -0,0 +1,78 @@
+"""
+Measure the cold-start time of the Player Report: a fresh process renders the page once,
+reading the stats either from SQLite or from the memory-mapped Arrow snapshot.
+
+Usage:
+    python -m benchmarks.bench_cold_start --seasons 3 --players 40 --sessions 300
+"""
+import argparse
+import os.path as osp
+import subprocess
+import sys
+
+import pandas as pd
+
+from benchmarks.synthetic import make_stats_frame, make_stats_database
+from database_operations.arrow_snapshot import write_snapshot
+from database_operations.engines import get_engine
+from database_operations.sql_queries import create_table, upsert_table
+from database_operations.tables_schema import file_available_schema, file_available_pk
+
+
+REPO_ROOT = osp.dirname(osp.dirname(osp.abspath(__file__)))
+
+RENDER_PAGE = '''
+import sys, time
+from streamlit.testing.v1 import AppTest
+import web_utils.data_loading as data_loading
+
+if sys.argv[2] == 'sqlite':
+    data_loading.SNAPSHOT_TABLES = []
+
+app = AppTest.from_file(sys.argv[3], default_timeout=600)
+app.session_state['local_save_path'] = sys.argv[1]
+start = time.perf_counter()
+app.run()
+assert not app.exception, app.exception
+print(time.perf_counter() - start)
+'''
+
+
+def render_time(db_path, source):
+    output = subprocess.run(
+        [sys.executable, '-c', RENDER_PAGE, db_path, source, osp.join(REPO_ROOT, 'pages_script', 'player_report.py')],
+        cwd=REPO_ROOT, capture_output=True, text=True, check=True,
+    )
+    return float(output.stdout.strip().splitlines()[-1])
+
+
+def run(n_seasons, n_players, n_sessions, repeat):
+    df = pd.concat([
+        make_stats_frame(n_players=n_players, n_sessions=n_sessions, start_date=f'{2020 + i}-07-01', seed=i)
+        for i in range(n_seasons)
+    ], ignore_index=True)
+    # The Player Report only knows the Full Training and Full Match sessions of the first players
+    df['Player'] = df['Player'].replace({'Player 0': 'A', 'Player 1': 'B'})
+
+    db_path = make_stats_database(df)
+    engine = get_engine(db_path, role='write')
+    create_table(engine, 'file_available', file_available_schema, file_available_pk)
+    upsert_table(engine, 'file_available', df[file_available_pk].drop_duplicates(), disable_pb=True)
+    print(f'{len(df)} rows, {n_seasons} seasons')
+
+    for source in ['sqlite', 'snapshot']:
+        if source == 'snapshot':
+            write_snapshot(db_path)
+        timings = [render_time(db_path, source) for _ in range(repeat)]
+        print(f'{source:>8}: first Player Report rendered in {min(timings):.2f}s (best of {repeat})')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seasons', type=int, default=3)
+    parser.add_argument('--players', type=int, default=40)
+    parser.add_argument('--sessions', type=int, default=300)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    run(args.seasons, args.players, args.sessions, args.repeat)
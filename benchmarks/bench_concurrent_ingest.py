@@ -0,0 +1,145 @@
+"""
+Stress test: dashboard readers querying the stats table while new sessions are ingested.
+
+Compares the reader latency with no writer, with a writer holding a single transaction on a
+rollback journal database (an import run before the ingest queue) and with the IngestQueue
+committing bounded batches on a WAL database. Readers run in their own processes, like the
+Streamlit server next to an ingest run. Latencies are measured on the existing sessions, and
+every tenth read checks the dates being written: every session it sees must be complete, or
+the read is counted as inconsistent.
+
+Usage:
+    python -m benchmarks.bench_concurrent_ingest --readers 4 --players 40 --sessions 300 --new-sessions 200
+"""
+import argparse
+import itertools
+import multiprocessing
+import random
+import statistics
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic import make_stats_database, make_stats_frame
+from database_operations.engines import dispose_engines, get_engine
+from database_operations.ingest import write_session_rows
+from database_operations.ingest_queue import IngestQueue
+from database_operations.query_builder import stats_filters
+from database_operations.sql_queries import create_table, select_from
+from database_operations.tables_schema import file_available_pk, file_available_schema
+
+
+def make_database(n_players, n_sessions, wal):
+    db_path = make_stats_database(make_stats_frame(n_players, n_sessions))
+    engine = get_engine(db_path, role='write', profile='ingest' if wal else 'sqlite_default')
+    create_table(engine, 'file_available', file_available_schema, file_available_pk)
+    with engine.connect() as connection:
+        connection.exec_driver_sql('SELECT 1')  # The ingest profile switches the file to WAL
+    return db_path
+
+
+def new_sessions(n_players, n_sessions, first_date):
+    df = make_stats_frame(n_players, n_sessions, start_date=first_date, seed=1)
+    df['date'] = df['date'].astype(str)
+    return [session for _, session in df.groupby('date', sort=True)]
+
+
+def single_transaction_writer(db_path, sessions):
+    with get_engine(db_path, role='write', profile='sqlite_default').begin() as connection:
+        for session in sessions:
+            write_session_rows(connection, session)
+
+
+def queue_writer(db_path, sessions):
+    with IngestQueue(db_path) as writer:
+        futures = [writer.submit(write_session_rows, session) for session in sessions]
+    for future in futures:
+        future.result()
+
+
+def reader(db_path, dates, new_dates, session_rows, seed, stop, queue):
+    engine = get_engine(db_path)
+    rng = random.Random(seed)
+    latencies, errors, inconsistent = [], [], 0
+    queue.put('ready')
+    for i in itertools.count():
+        if stop.is_set():
+            break
+        checked = new_dates if i % 10 == 9 else dates
+        first = rng.randrange(len(checked) - 7)
+        filters = stats_filters([checked[first], checked[first + 7]])
+        start = time.perf_counter()
+        try:
+            df = select_from(engine, 'stats', ['Player', 'date', 'type', 'Distanza', 'RPE'], filters)
+        except Exception as e:
+            errors.append(str(e).splitlines()[0])
+            continue
+        if checked is dates:
+            latencies.append((time.perf_counter() - start) * 1000)
+        inconsistent += int((df.groupby('date').size() != session_rows).any())
+    queue.put((latencies, errors, inconsistent))
+
+
+def run_scenario(context, label, db_path, n_readers, dates, new_dates, session_rows, writer=None, sessions=None,
+                 idle_seconds=5.0):
+    stop, queue = context.Event(), context.Queue()
+    processes = [
+        context.Process(target=reader, args=(db_path, dates, new_dates, session_rows, seed, stop, queue))
+        for seed in range(n_readers)
+    ]
+    for process in processes:
+        process.start()
+    for _ in processes:
+        queue.get()
+
+    start = time.perf_counter()
+    if writer is None:
+        time.sleep(idle_seconds)
+    else:
+        writer(db_path, sessions)
+    seconds = time.perf_counter() - start
+
+    stop.set()
+    latencies, errors, inconsistent = [], [], 0
+    for _ in processes:
+        reader_latencies, reader_errors, reader_inconsistent = queue.get()
+        latencies += reader_latencies
+        errors += reader_errors
+        inconsistent += reader_inconsistent
+    for process in processes:
+        process.join()
+    dispose_engines(db_path)
+
+    p95 = statistics.quantiles(latencies, n=20)[-1]
+    print(f'{label:>32}: {len(latencies):5d} reads, median {statistics.median(latencies):6.2f} ms, '
+          f'p95 {p95:7.2f} ms, max {max(latencies):7.1f} ms, {len(errors)} errors, '
+          f'{inconsistent} inconsistent, writer {seconds:.2f} s')
+    if errors:
+        print(f'{"":>34}{errors[0]}')
+
+
+def run(n_readers, n_players, n_sessions, n_new_sessions):
+    context = multiprocessing.get_context('spawn')
+    all_dates = [str(d) for d in pd.date_range('2022-07-01', periods=n_sessions + n_new_sessions, freq='D').date]
+    dates, new_dates = all_dates[:n_sessions], all_dates[n_sessions:]
+    sessions = new_sessions(n_players, n_new_sessions, new_dates[0])
+    session_rows = n_players + 1
+
+    for label, wal, writer in [
+        ('no writer', True, None),
+        ('rollback journal, 1 transaction', False, single_transaction_writer),
+        ('WAL, ingest queue', True, queue_writer),
+    ]:
+        run_scenario(context, label, make_database(n_players, n_sessions, wal), n_readers, dates, new_dates,
+                     session_rows, writer, sessions)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--players', type=int, default=40)
+    parser.add_argument('--sessions', type=int, default=300)
+    parser.add_argument('--new-sessions', type=int, default=200)
+    args = parser.parse_args()
+
+    run(args.readers, args.players, args.sessions, args.new_sessions)
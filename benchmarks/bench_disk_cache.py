@@ -0,0 +1,57 @@
+"""
+Read the stats table and build a session figure from scratch, and find them in the disk cache
+as a freshly started server process would.
+
+Usage:
+    python -m benchmarks.bench_disk_cache --players 40 --sessions 2000
+"""
+import argparse
+import json
+import tempfile
+
+import pandas as pd
+import plotly.graph_objects as go
+
+from benchmarks.bench_storage import median_ms
+from benchmarks.synthetic import make_stats_database, make_stats_frame
+from database_operations.disk_cache import DiskCache
+from database_operations.dtype_policy import apply_dtype_policy
+from database_operations.engines import get_engine
+from database_operations.sql_queries import select_from
+from web_utils.custom_viz import create_session_bar_overview
+from web_utils.data_loading import load_metrics
+
+
+def run(n_players, n_sessions):
+    db_path = make_stats_database(make_stats_frame(n_players, n_sessions))
+    cache = DiskCache(tempfile.mkdtemp())
+
+    def read_stats():
+        return apply_dtype_policy(select_from(get_engine(db_path), 'stats'))
+
+    cache.put_frame(('stats',), read_stats())
+    database = median_ms(read_stats)
+    disk = median_ms(lambda: cache.get_frame(('stats',)))
+    print(f'stats table, {n_players} players and {n_sessions} sessions: database {database:.0f} ms, disk cache {disk:.0f} ms')
+
+    metrics_df = pd.DataFrame(load_metrics())
+    metrics = list(metrics_df.name[:4])
+    stats = read_stats()
+    session = stats.loc[stats.date == pd.Timestamp('2022-09-06')]
+
+    def build():
+        return create_session_bar_overview(session, metrics_df, metrics, 'Full Training', '2022-09-06').to_json()
+
+    cache.put_text(('figure',), build())
+    built = median_ms(build)
+    disk = median_ms(lambda: go.Figure(json.loads(cache.get_text(('figure',))), _validate=False))
+    print(f'session figure of {len(metrics)} metrics: built {built:.0f} ms, disk cache {disk:.1f} ms')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--players', type=int, default=40)
+    parser.add_argument('--sessions', type=int, default=2000)
+    args = parser.parse_args()
+
+    run(args.players, args.sessions)
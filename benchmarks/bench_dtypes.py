@@ -0,0 +1,39 @@
+"""
+Memory of a season of stats rows with the database driver dtypes and with the dtype policy.
+
+Usage:
+    python -m benchmarks.bench_dtypes --players 40 --sessions 300
+    python -m benchmarks.bench_dtypes --db data/gps_data.db
+"""
+import argparse
+import time
+
+from benchmarks.synthetic import make_stats_database, make_stats_frame
+from database_operations.dtype_policy import apply_dtype_policy, memory_report
+from database_operations.engines import get_engine
+from database_operations.sql_queries import select_from
+
+
+def run(db_path):
+    df = select_from(get_engine(db_path), 'stats')
+
+    start = time.perf_counter()
+    compact = apply_dtype_policy(df)
+    seconds = time.perf_counter() - start
+
+    report = memory_report(df, compact)
+    changed = report.loc[report['dtype_before'] != report['dtype_after']]
+    print(changed.groupby(['dtype_before', 'dtype_after'])[['bytes_before', 'bytes_after']].sum().to_string())
+    total = report.loc['Total']
+    print(f"{len(df):,} rows, {total['bytes_before'] / 2**20:.1f} MB -> {total['bytes_after'] / 2**20:.1f} MB "
+          f"({total['saved']:.0%} saved), policy applied in {seconds * 1000:.0f} ms")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default=None, help='Database to measure instead of a synthetic season')
+    parser.add_argument('--players', type=int, default=40)
+    parser.add_argument('--sessions', type=int, default=300)
+    args = parser.parse_args()
+
+    run(args.db or make_stats_database(make_stats_frame(args.players, args.sessions)))
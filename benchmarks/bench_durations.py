@@ -0,0 +1,54 @@
+"""
+Compare the row-wise duration conversion (strptime per cell) with parse_durations.
+
+Usage:
+    python -m benchmarks.bench_durations --values 1000000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from web_utils.data_manipulation import convert_to_seconds, parse_durations
+
+
+def make_durations(n_values, max_seconds, seed=0):
+    """'HH:MM:SS' strings of random durations up to max_seconds."""
+    seconds = np.random.default_rng(seed).integers(0, max_seconds, n_values)
+    hours, rest = np.divmod(seconds, 3600)
+    minutes, seconds = np.divmod(rest, 60)
+    return pd.Series([f'{h:02d}:{m:02d}:{s:02d}' for h, m, s in zip(hours, minutes, seconds)])
+
+
+# Durations strptime accepts without the fixed 'HH:MM:SS' width: short or unpadded components
+IRREGULAR_DURATIONS = ['1:2:3', '1:02:3', '01:2:03', '0:0:0', '1:2:03', '10:5:07', '1:05:07', '12:34:5']
+
+
+def run(n_values):
+    expected = [convert_to_seconds(value) for value in IRREGULAR_DURATIONS]
+    assert parse_durations(IRREGULAR_DURATIONS).tolist() == expected, 'parse_durations differs from convert_to_seconds'
+
+    # Session lengths (few distinct values) and a whole day of distinct durations
+    for label, max_seconds in [('session', 2 * 3600), ('day', 24 * 3600)]:
+        durations = make_durations(n_values, max_seconds)
+
+        start = time.perf_counter()
+        expected = durations.apply(convert_to_seconds)
+        row_wise = time.perf_counter() - start
+
+        start = time.perf_counter()
+        parsed = parse_durations(durations)
+        vectorized = time.perf_counter() - start
+
+        assert (parsed.to_numpy() == expected.to_numpy()).all()
+        print(f'{label:>8}: {n_values:,} values, apply {row_wise:.2f}s ({row_wise / n_values * 1e6:.2f} us/value), '
+              f'parse_durations {vectorized:.3f}s, speed-up {row_wise / vectorized:.0f}x')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--values', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    run(args.values)
@@ -0,0 +1,51 @@
+"""
+Compare per-query latency of a fresh engine per call (disposed afterwards) with the
+pooled engines of the registry.
+
+Usage:
+    python -m benchmarks.bench_engines --queries 200
+"""
+import argparse
+import statistics
+import time
+
+from sqlalchemy import create_engine
+
+from benchmarks.synthetic import make_stats_frame, make_stats_database
+from database_operations.engines import get_engine, dispose_engines
+from database_operations.sql_queries import select_from
+
+
+def time_queries(get, n_queries, where_condition, dispose):
+    latencies = []
+    for _ in range(n_queries):
+        start = time.perf_counter()
+        engine = get()
+        select_from(engine, 'stats', where_condition=where_condition)
+        if dispose:
+            engine.dispose()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def run(n_queries):
+    db_path = make_stats_database(make_stats_frame(n_players=25, n_sessions=60))
+    where_condition = "date >= '2022-07-10' AND date <= '2022-07-12' AND type IN ('Full Training')"
+
+    for label, get, dispose in [
+        ('engine per call', lambda: create_engine(f'sqlite:///{db_path}'), True),
+        ('pooled registry', lambda: get_engine(db_path), False),
+    ]:
+        latencies = time_queries(get, n_queries, where_condition, dispose)
+        print(f'{label:>16}: median {statistics.median(latencies):.2f} ms, '
+              f'p95 {statistics.quantiles(latencies, n=20)[-1]:.2f} ms')
+
+    dispose_engines(db_path)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args()
+
+    run(args.queries)
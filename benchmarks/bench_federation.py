@@ -0,0 +1,53 @@
+"""
+Query one month of a federation of synthetic seasons, with the season pruning and through the
+UNION ALL view of every season.
+
+Usage:
+    python -m benchmarks.bench_federation --seasons 8 --players 40 --sessions 300
+"""
+import argparse
+import os.path as osp
+import tempfile
+
+import pandas as pd
+
+from benchmarks.bench_storage import median_ms
+from benchmarks.synthetic import make_stats_database, make_stats_frame
+from database_operations import federation
+
+
+def run(n_seasons, n_players, n_sessions):
+    folder = tempfile.mkdtemp()
+    seasons = {}
+    for i in range(n_seasons):
+        year = 2015 + i
+        df = make_stats_frame(n_players, n_sessions, start_date=f'{year}-07-01', seed=i)
+        seasons[f'{year % 100}_{(year + 1) % 100}'] = make_stats_database(df, osp.join(folder, f'season_{i}.db'))
+    federation_path = federation.write_federation(osp.join(folder, 'seasons.json'), seasons)
+
+    year = 2015 + n_seasons - 1
+    filters = [('date', '>=', f'{year}-10-01'), ('date', '<=', f'{year}-10-31')]
+    read = len(federation.prune_seasons(federation_path, 'stats', filters))
+
+    pruned = median_ms(lambda: federation.select_from(federation_path, 'stats', ['Player', 'date', 'Distanza'], filters))
+
+    def view_query():
+        with federation.get_engine(federation_path).connect() as connection:
+            return pd.read_sql_query(
+                "SELECT `Player`, `date`, `Distanza` FROM `stats` WHERE `date` >= ? AND `date` <= ?",
+                connection, params=tuple(value for _, _, value in filters),
+            )
+    view = median_ms(view_query)
+
+    print(f'{n_seasons} seasons, one month of the last one: pruned to {read} season(s) {pruned:.1f} ms, '
+          f'view of every season {view:.1f} ms')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seasons', type=int, default=8)
+    parser.add_argument('--players', type=int, default=40)
+    parser.add_argument('--sessions', type=int, default=300)
+    args = parser.parse_args()
+
+    run(args.seasons, args.players, args.sessions)
@@ -0,0 +1,66 @@
+"""
+Compare ingest throughput and query latency under each SQLite profile.
+
+Every session is upserted in its own transaction, as an import run does, so the profiles
+differ by how many fsyncs a commit costs.
+
+Usage:
+    python -m benchmarks.bench_profiles --players 40 --sessions 100
+"""
+import argparse
+import os.path as osp
+import statistics
+import tempfile
+import time
+
+from benchmarks.synthetic import make_stats_frame
+from database_operations.engines import get_engine
+from database_operations.query_builder import stats_filters
+from database_operations.sql_queries import create_table, upsert_table, select_from
+from database_operations.tables_indexes import create_indexes
+from database_operations.tables_schema import stats_schema, stats_schema_pk
+
+
+def ingest(db_path, df, profile):
+    engine = get_engine(db_path, role='write', profile=profile)
+    create_table(engine, 'stats', stats_schema, stats_schema_pk)
+    create_indexes(engine, 'stats')
+
+    start = time.perf_counter()
+    for _, session in df.groupby(['date', 'type'], sort=False):
+        upsert_table(engine, 'stats', session, disable_pb=True)
+    return len(df) / (time.perf_counter() - start)
+
+
+def query_latency(db_path, df, profile, n_queries=50):
+    engine = get_engine(db_path, role='read', profile=profile)
+    dates = sorted(df['date'].unique())
+
+    latencies = []
+    for i in range(n_queries):
+        day = dates[i % len(dates)]
+        start = time.perf_counter()
+        select_from(engine, 'stats', where_condition=stats_filters([day, dates[min(i % len(dates) + 30, len(dates) - 1)]]))
+        latencies.append((time.perf_counter() - start) * 1000)
+    return statistics.median(latencies)
+
+
+def run(n_players, n_sessions):
+    df = make_stats_frame(n_players=n_players, n_sessions=n_sessions)
+    print(f'{len(df)} rows in {n_sessions} sessions')
+
+    for write_profile, read_profile in [('sqlite_default', 'sqlite_default'), ('ingest', 'dashboard')]:
+        db_path = osp.join(tempfile.mkdtemp(), 'bench.db')
+        rows_per_s = ingest(db_path, df, write_profile)
+        latency = query_latency(db_path, df, read_profile)
+        print(f'{write_profile:>14} / {read_profile:<14}: ingest {rows_per_s:10,.0f} rows/s | '
+              f'one month query {latency:6.2f} ms')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--players', type=int, default=40)
+    parser.add_argument('--sessions', type=int, default=100)
+    args = parser.parse_args()
+
+    run(args.players, args.sessions)
@@ -0,0 +1,62 @@
+"""
+Slice the in-memory StatsStore and query the database (the uncached load_stats path) for the
+selections of the reports: one session, a month of one player and a month of the team.
+
+A store over its memory ceiling is sized from the table metadata and never loads the table.
+
+Usage:
+    python -m benchmarks.bench_stats_store --players 40 --sessions 2000
+"""
+import argparse
+import os.path as osp
+
+from benchmarks.bench_storage import median_ms
+from benchmarks.synthetic import make_stats_database, make_stats_frame
+from database_operations.arrow_snapshot import snapshot_path
+from database_operations.data_version import data_version
+from database_operations.dtype_policy import apply_dtype_policy
+from database_operations.engines import get_engine
+from database_operations.query_builder import stats_filters
+from database_operations.sql_queries import select_from
+from database_operations.stats_store import StatsStore
+from web_utils.data_loading import _estimate_stats_store, select_from_source
+
+
+def run(n_players, n_sessions):
+    db_path = make_stats_database(make_stats_frame(n_players, n_sessions))
+    engine = get_engine(db_path)
+
+    def query(columns, filters):
+        return apply_dtype_policy(select_from(engine, 'stats', columns, filters))
+
+    store = StatsStore(load=lambda: query([], []), version=lambda: data_version(db_path))
+    print(f'{n_players} players, {n_sessions} sessions: store of {store.nbytes / 2**20:.1f} MB, '
+          f'loaded in {median_ms(lambda: StatsStore(store.load, store.version), repeat=1):.0f} ms')
+
+    columns = ['Player', 'date', 'type', 'Distanza', 'RPE']
+    for label, dates, types, player in [
+        ('one session', ['2022-09-06'] * 2, ['Full Training'], None),
+        ('one player, one month', ['2022-09-01', '2022-09-30'], [], 'Player 0'),
+        ('team, one month', ['2022-09-01', '2022-09-30'], [], None),
+    ]:
+        filters = stats_filters(dates, types)
+        if player is not None:
+            filters.append(('Player', '=', player))
+        database = median_ms(lambda: query(columns, filters))
+        sliced = median_ms(lambda: store.select(dates, types, None, columns, player))
+        print(f'{label:>24}: database {database:7.2f} ms, store {sliced:6.2f} ms')
+
+    over = StatsStore(load=lambda: select_from_source(db_path, 'stats'), version=store.version,
+                      max_bytes=store.nbytes // 2, estimate=lambda: _estimate_stats_store(db_path))
+    # The unfiltered load would have written the Arrow snapshot of the whole table
+    assert not over.loaded and not osp.exists(snapshot_path(db_path))
+    print(f'over the ceiling: sized in {median_ms(lambda: _estimate_stats_store(db_path)):.2f} ms, table not loaded')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--players', type=int, default=40)
+    parser.add_argument('--sessions', type=int, default=2000)
+    args = parser.parse_args()
+
+    run(args.players, args.sessions)
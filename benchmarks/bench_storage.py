@@ -0,0 +1,66 @@
+"""
+Compare the SQLite database with the partitioned Parquet store on a synthetic multi-season squad.
+
+Usage:
+    python -m benchmarks.bench_storage --seasons 3 --players 40 --sessions 300
+"""
+import argparse
+import os.path as osp
+import statistics
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic import make_stats_frame, make_stats_database
+from database_operations import parquet_store
+from database_operations.engines import get_engine
+from database_operations.query_builder import stats_filters
+from database_operations.sql_queries import select_from
+from database_operations.tables_indexes import create_indexes
+
+
+def median_ms(fn, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def run(n_seasons, n_players, n_sessions):
+    df = pd.concat([
+        make_stats_frame(n_players=n_players, n_sessions=n_sessions, start_date=f'{2020 + i}-07-01', seed=i)
+        for i in range(n_seasons)
+    ], ignore_index=True)
+    print(f'{len(df)} rows, {n_seasons} seasons')
+
+    db_path = make_stats_database(df)
+    create_indexes(get_engine(db_path, role='write'), 'stats')
+    store_path = osp.join(tempfile.mkdtemp(), 'store')
+    parquet_store.write_stats(store_path, df)
+
+    first_day = df['date'].min()
+    queries = {
+        'one month, all columns': ([], stats_filters([first_day, first_day + pd.Timedelta(days=30)])),
+        'one session, 3 columns': (['Player', 'Minutes', 'Distanza'], stats_filters([first_day] * 2, ['Full Training'])),
+        'all seasons, 3 columns': (['Player', 'date', 'Distanza'], []),
+        'all seasons, matches': ([], stats_filters(types=['Full Match'])),
+    }
+
+    engine = get_engine(db_path)
+    for description, (columns, filters) in queries.items():
+        sqlite_ms = median_ms(lambda: select_from(engine, 'stats', columns, filters))
+        parquet_ms = median_ms(lambda: parquet_store.select_from(store_path, 'stats', columns, filters))
+        print(f'{description:>24}: sqlite {sqlite_ms:8.1f} ms | parquet {parquet_ms:8.1f} ms')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seasons', type=int, default=3)
+    parser.add_argument('--players', type=int, default=40)
+    parser.add_argument('--sessions', type=int, default=300)
+    args = parser.parse_args()
+
+    run(args.seasons, args.players, args.sessions)
@@ -0,0 +1,81 @@
+"""
+Compare the peak memory of a season-wide aggregation done on the full table (select_from)
+and on a stream of chunks (iter_select_from + aggregate_chunks).
+
+Each mode runs in a fresh process so that its peak resident set size is measured alone.
+
+Usage:
+    python -m benchmarks.bench_streaming --seasons 5 --players 40 --sessions 300
+"""
+import argparse
+import multiprocessing
+import resource
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic import make_stats_frame, make_stats_database
+from database_operations.engines import get_engine
+from database_operations.sql_queries import iter_select_from, select_from
+from database_operations.tables_schema import stats_schema
+from web_utils.data_manipulation import aggregate_chunks
+
+
+METRICS = [col for col, col_type in stats_schema.items() if col_type in ('REAL', 'INTEGER')]
+
+
+def aggregate(db_path, mode, chunk_size, queue):
+    # No mmap, the mapped pages of the database file would count in the resident set of both modes
+    engine = get_engine(db_path, profile='sqlite_default')
+    start = time.perf_counter()
+    if mode == 'full':
+        df = select_from(engine, 'stats', ['Player', 'type'] + METRICS)
+        result = df.groupby(['Player', 'type'])[METRICS].agg(['sum', 'count', 'mean', 'min', 'max'])
+    else:
+        chunks = iter_select_from(engine, 'stats', ['Player', 'type'] + METRICS, chunk_size=chunk_size)
+        result = aggregate_chunks(chunks, ['Player', 'type'], METRICS)
+    elapsed = time.perf_counter() - start
+    # ru_maxrss is in kilobytes on Linux
+    queue.put((len(result), elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024))
+
+
+def make_database(n_seasons, n_players, n_sessions, queue):
+    seasons = [
+        make_stats_frame(n_players=n_players, n_sessions=n_sessions, start_date=f'{2022 + i}-07-01', seed=i)
+        for i in range(n_seasons)
+    ]
+    df = pd.concat(seasons, ignore_index=True)
+    queue.put((make_stats_database(df), len(df)))
+
+
+def in_process(context, target, *args):
+    """Run target in a fresh process and return what it put in its queue."""
+    queue = context.Queue()
+    process = context.Process(target=target, args=args + (queue,))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def run(n_seasons, n_players, n_sessions, chunk_size):
+    # Children inherit the peak RSS of their parent, which must stay small: the synthetic
+    # frames are built in their own process too
+    context = multiprocessing.get_context('spawn')
+    db_path, n_rows = in_process(context, make_database, n_seasons, n_players, n_sessions)
+    print(f'{n_rows:,} rows in {db_path}')
+
+    for mode in ['full', 'streaming']:
+        groups, elapsed, peak_mb = in_process(context, aggregate, db_path, mode, chunk_size)
+        print(f'{mode:>10}: {groups} groups in {elapsed:.2f}s, peak RSS {peak_mb:,.0f} MB')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seasons', type=int, default=5)
+    parser.add_argument('--players', type=int, default=40)
+    parser.add_argument('--sessions', type=int, default=300)
+    parser.add_argument('--chunk-size', type=int, default=10000)
+    args = parser.parse_args()
+
+    run(args.seasons, args.players, args.sessions, args.chunk_size)
@@ -0,0 +1,42 @@
+"""
+Compare the row-by-row upsert with the bulk (staging table) upsert.
+
+Usage:
+    python -m benchmarks.bench_upsert --players 40 --sessions 30
+"""
+import argparse
+import time
+
+from sqlalchemy import create_engine
+
+from benchmarks.synthetic import make_stats_frame, make_stats_database
+from database_operations.sql_queries import upsert_table
+
+
+def run(n_players, n_sessions):
+    df = make_stats_frame(n_players=n_players, n_sessions=n_sessions)
+    # Half of the rows already exist so both the insert and update branches are exercised
+    existing = df.iloc[:len(df) // 2]
+
+    results = {}
+    for label, bulk in [('row-by-row', False), ('bulk', True)]:
+        db_path = make_stats_database(existing)
+        engine = create_engine(f'sqlite:///{db_path}')
+
+        start = time.perf_counter()
+        counts = upsert_table(engine, 'stats', df, bulk=bulk, disable_pb=True)
+        elapsed = time.perf_counter() - start
+
+        results[label] = elapsed
+        print(f'{label:>12}: {len(df)} rows in {elapsed:.2f}s ({len(df) / elapsed:,.0f} rows/s) {counts or ""}')
+
+    print(f'Speed-up: {results["row-by-row"] / results["bulk"]:.1f}x')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--players', type=int, default=40)
+    parser.add_argument('--sessions', type=int, default=30)
+    args = parser.parse_args()
+
+    run(args.players, args.sessions)
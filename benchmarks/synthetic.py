@@ -0,0 +1,81 @@
+import os
+import os.path as osp
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from database_operations.sql_queries import create_database, create_table
+from database_operations.tables_schema import stats_schema, stats_schema_pk
+
+
+SESSION_TYPES = ['Full Training', 'Full Match']
+
+
+def make_stats_frame(n_players=40, n_sessions=300, start_date='2022-07-01', category='First Team', seed=0):
+    """
+    Build a synthetic stats DataFrame shaped like the `stats` table.
+
+    Every session has one row per player plus the 'Team Average' row, one session per day
+    with a match every seventh day.
+
+    Args:
+    - n_players (int): Number of players in the squad. Default is 40.
+    - n_sessions (int): Number of sessions (days). Default is 300.
+    - start_date (str): Date of the first session. Default is '2022-07-01'.
+    - category (str): Value of the category column. Default is 'First Team'.
+    - seed (int): Seed of the random generator. Default is 0.
+
+    Returns:
+    - pd.DataFrame: DataFrame with the stats_schema columns.
+    """
+    rng = np.random.default_rng(seed)
+
+    players = [f'Player {i}' for i in range(n_players)] + ['Team Average']
+    dates = pd.date_range(start_date, periods=n_sessions, freq='D').date
+    types = [SESSION_TYPES[1] if i % 7 == 6 else SESSION_TYPES[0] for i in range(n_sessions)]
+
+    n_rows = len(players) * n_sessions
+    df = pd.DataFrame({
+        'Player': np.tile(players, n_sessions),
+        'date': np.repeat(dates, len(players)),
+        'type': np.repeat(types, len(players)),
+        'category': category,
+    })
+
+    for col, col_type in stats_schema.items():
+        if col in df.columns:
+            continue
+        if col_type == 'INTEGER':
+            df[col] = rng.integers(0, 200, n_rows)
+        else:
+            df[col] = np.round(rng.uniform(0, 10000, n_rows), 2)
+
+    return df[list(stats_schema.keys())]
+
+
+def make_stats_database(df=None, db_path=None):
+    """
+    Create a SQLite database with an empty (or filled with df) `stats` table.
+
+    Args:
+    - df (DataFrame, optional): Rows to load in the table.
+    - db_path (str, optional): Where to create the database. Defaults to a temporary file.
+
+    Returns:
+    - str: Path of the database.
+    """
+    from database_operations.sql_queries import upsert_table
+
+    if db_path is None:
+        db_path = osp.join(tempfile.mkdtemp(), 'bench.db')
+    elif osp.exists(db_path):
+        os.remove(db_path)
+
+    engine = create_database(db_path)
+    engine.echo = False
+    create_table(engine, 'stats', stats_schema, stats_schema_pk)
+    if df is not None:
+        upsert_table(engine, 'stats', df, disable_pb=True)
+
+    return db_path
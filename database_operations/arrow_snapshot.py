@@ -0,0 +1,160 @@
+import json
+import os
+import os.path as osp
+import tempfile
+import threading
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.feather as feather
+
+from database_operations.data_version import file_fingerprint
+from database_operations.parquet_store import filters_expression, iter_batches
+
+
+# The snapshot is stored uncompressed so it can be memory-mapped and read without copies
+FINGERPRINT_KEY = b'db_fingerprint'
+
+_snapshots = {}
+_snapshot_locks = {}
+_snapshots_lock = threading.Lock()
+
+
+def snapshot_path(db_path, table_name='stats'):
+    """Path of the Arrow IPC (Feather v2) snapshot of a table, next to the database."""
+    return osp.join(osp.dirname(db_path), f'{osp.splitext(osp.basename(db_path))[0]}_{table_name}.arrow')
+
+
+def write_snapshot(db_path, table_name='stats'):
+    """
+    Write the snapshot of a table of the database, stamped with the database fingerprint.
+
+    Rows are stored in the (date, type, Player) order of the stats primary key.
+
+    Args:
+    - db_path (str): Path of the SQLite database.
+    - table_name (str): Table to snapshot. Default is 'stats'.
+
+    Returns:
+    - str: Path of the snapshot.
+    """
+    from database_operations.engines import get_engine
+    from database_operations.sql_queries import select_from
+
+    # Taken before reading so a write happening meanwhile invalidates the snapshot
+    fingerprint = file_fingerprint(db_path)
+    df = select_from(get_engine(db_path), table_name)
+    sort_cols = [col for col in ['date', 'type', 'Player'] if col in df.columns]
+    if sort_cols:
+        df = df.sort_values(sort_cols, kind='stable', ignore_index=True)
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.replace_schema_metadata({
+        **(table.schema.metadata or {}),
+        FINGERPRINT_KEY: json.dumps(fingerprint).encode(),
+    })
+
+    path = snapshot_path(db_path, table_name)
+    # Unique per writer: processes refreshing the same snapshot never write into each other's file
+    fd, tmp_path = tempfile.mkstemp(dir=osp.dirname(path) or '.', prefix=osp.basename(path), suffix='.tmp')
+    os.close(fd)
+    try:
+        feather.write_feather(table, tmp_path, compression='uncompressed')
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+    return path
+
+
+def _read_fingerprint(table):
+    metadata = table.schema.metadata or {}
+    if FINGERPRINT_KEY not in metadata:
+        return None
+    return tuple(json.loads(metadata[FINGERPRINT_KEY]))
+
+
+def load_snapshot(db_path, table_name='stats'):
+    """
+    Return the memory-mapped snapshot of a table, regenerating it if the database changed.
+
+    The opened snapshot is kept for the whole process, further calls only compare fingerprints.
+
+    Args:
+    - db_path (str): Path of the SQLite database.
+    - table_name (str): Table of the snapshot. Default is 'stats'.
+
+    Returns:
+    - pa.Table: The table, its buffers point into the memory-mapped file.
+    """
+    key = (osp.abspath(db_path), table_name)
+    fingerprint = file_fingerprint(db_path)
+
+    with _snapshots_lock:
+        lock = _snapshot_locks.setdefault(key, threading.Lock())
+
+    # One rebuild per snapshot at a time, the snapshots of other tables and databases stay readable
+    with lock:
+        table = _snapshots.get(key)
+        if table is not None and _read_fingerprint(table) == fingerprint:
+            return table
+
+        path = snapshot_path(db_path, table_name)
+        table = None
+        if osp.exists(path):
+            table = pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+        if table is None or _read_fingerprint(table) != fingerprint:
+            write_snapshot(db_path, table_name)
+            table = pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+
+        _snapshots[key] = table
+
+    return table
+
+
+def select_from(db_path, from_table, cols_to_select=[], where_condition=None):
+    """
+    Perform a SELECT on the snapshot of a table, the counterpart of sql_queries.select_from.
+
+    Args:
+    - db_path (str): Path of the SQLite database the snapshot belongs to.
+    - from_table (str): Name of the table from which to select.
+    - cols_to_select (list, optional): List of column names to select. If empty, selects all columns.
+    - where_condition (list, optional): List of (column, operator, value) filters.
+
+    Returns:
+    - pd.DataFrame: DataFrame containing the selected rows.
+    """
+    table = load_snapshot(db_path, from_table)
+
+    expression = filters_expression(where_condition or [])
+    if expression is not None:
+        table = table.filter(expression)
+    if cols_to_select:
+        table = table.select(list(cols_to_select))
+
+    # split_blocks avoids consolidating the columns, numeric ones stay views on the mapped file
+    return table.to_pandas(split_blocks=True)
+
+
+def iter_select_from(db_path, from_table, cols_to_select=[], where_condition=None, chunk_size=10000, arrow=False):
+    """
+    Streaming variant of select_from, yielding the rows in chunks of at most chunk_size.
+
+    The filters are applied batch by batch, so the filtered table is never materialized as a
+    whole: only the current chunk is copied out of the memory-mapped file.
+
+    Args:
+    - db_path (str): Path of the SQLite database the snapshot belongs to.
+    - from_table (str): Name of the table from which to select.
+    - cols_to_select (list, optional): List of column names to select. If empty, selects all columns.
+    - where_condition (list, optional): List of (column, operator, value) filters.
+    - chunk_size (int): Maximum number of rows per chunk. Default is 10000.
+    - arrow (bool): Yield pyarrow RecordBatches instead of DataFrames. Default is False.
+
+    Yields:
+    - pd.DataFrame or pa.RecordBatch: The next chunk of rows.
+    """
+    dataset = ds.dataset(load_snapshot(db_path, from_table))
+    yield from iter_batches(dataset, cols_to_select, where_condition, chunk_size, arrow)
@@ -0,0 +1,61 @@
+import hashlib
+import os
+import os.path as osp
+
+
+def file_fingerprint(db_path):
+    """
+    Return a fingerprint of a SQLite database that changes whenever its content changes.
+
+    The write-ahead log is part of the fingerprint since committed transactions only reach
+    the main file at the next checkpoint.
+
+    Args:
+    - db_path (str): Path of the SQLite database.
+
+    Returns:
+    - tuple: (size, mtime in ns) of the database file followed by the ones of its -wal file, if any.
+    """
+    fingerprint = ()
+    for path in [db_path, f'{db_path}-wal']:
+        if osp.exists(path):
+            stat = os.stat(path)
+            fingerprint += (stat.st_size, stat.st_mtime_ns)
+    return fingerprint
+
+
+def _folder_fingerprint(folder):
+    """(relative path, size, mtime in ns) of every file below a folder, e.g. a Parquet store."""
+    fingerprint = []
+    for root, _, files in os.walk(folder):
+        for name in files:
+            stat = os.stat(osp.join(root, name))
+            fingerprint.append((osp.relpath(osp.join(root, name), folder), stat.st_size, stat.st_mtime_ns))
+    return tuple(sorted(fingerprint))
+
+
+def data_version(path):
+    """
+    Return a token that changes whenever the data found at path changes.
+
+    The token is meant to be part of the cache keys of the data loaders: after an ingest or a
+    new database file the keys change, so stale entries are no longer served while the ones of
+    other databases stay valid. Computing it costs a stat per file.
+
+    Args:
+    - path (str): A SQLite database, a Parquet store folder or a federation file.
+
+    Returns:
+    - str: Short hex digest of the fingerprints, the same while the data does not change.
+    """
+    from database_operations.federation import is_federation, load_seasons
+
+    if osp.isdir(path):
+        fingerprint = _folder_fingerprint(path)
+    elif is_federation(path):
+        fingerprint = (file_fingerprint(path),) + tuple(
+            (season, file_fingerprint(db_path)) for season, db_path in load_seasons(path).items()
+        )
+    else:
+        fingerprint = file_fingerprint(path)
+    return hashlib.sha1(repr(fingerprint).encode()).hexdigest()[:16]
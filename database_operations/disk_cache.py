@@ -0,0 +1,185 @@
+import gzip
+import hashlib
+import os
+import os.path as osp
+import threading
+import uuid
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+# Folder of the disk cache, set DASHBOARD_CACHE_DIR to move it or to an empty string to disable it
+DISK_CACHE_DIR = os.environ.get('DASHBOARD_CACHE_DIR', osp.join('data', 'cache'))
+DISK_CACHE_MAX_BYTES = int(os.environ.get('DASHBOARD_CACHE_MAX_MB', 1024)) * 2 ** 20
+
+FRAME_SUFFIX = '.parquet'
+TEXT_SUFFIX = '.json.gz'
+
+
+class DiskCache:
+    """
+    Cache of query results and figures kept on disk, shared by processes and restarts.
+
+    Frames are stored as Parquet files and texts (the figure JSON) gzip compressed, one file
+    per key named after its hash. Keys hold the data version, entries of older data are never
+    read again and age out: reading a file refreshes its modification time, and the oldest files
+    are deleted once the folder grows over max_bytes.
+
+    Files are written to a temporary name and renamed, so other processes never read a partial
+    file. A file that can not be read is deleted and counted as a miss. If the folder can not be
+    created or written, e.g. on a read-only deployment, the cache disables itself: enabled is
+    False, reads miss and writes are skipped.
+
+    Args:
+    - folder (str): Folder of the cache, created if missing. Default is DISK_CACHE_DIR.
+    - max_bytes (int): Total size of the files kept. Default is DISK_CACHE_MAX_BYTES.
+    """
+
+    def __init__(self, folder=DISK_CACHE_DIR, max_bytes=DISK_CACHE_MAX_BYTES):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+        self.enabled = True
+
+        self._lock = threading.Lock()
+        self.nbytes = 0
+        try:
+            os.makedirs(folder, exist_ok=True)
+        except OSError as e:
+            self._disable(e)
+            return
+        self.nbytes = sum(size for _, size, _ in self._files())
+
+    def get_frame(self, key):
+        """Return the DataFrame stored under key, None if there is none."""
+        return self._read(key, FRAME_SUFFIX, _read_frame)
+
+    def put_frame(self, key, df):
+        """Store a DataFrame under key, with its dtypes (categories, float32, ...) as Parquet metadata."""
+        def write(path):
+            pq.write_table(pa.Table.from_pandas(df, preserve_index=False), path, compression='zstd')
+        self._write(key, FRAME_SUFFIX, write)
+
+    def get_text(self, key):
+        """Return the text stored under key, None if there is none."""
+        def read(path):
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                return f.read()
+        return self._read(key, TEXT_SUFFIX, read)
+
+    def put_text(self, key, text):
+        """Store a text, e.g. the JSON of a figure, gzip compressed under key."""
+        def write(path):
+            with gzip.open(path, 'wt', encoding='utf-8', compresslevel=6) as f:
+                f.write(text)
+        self._write(key, TEXT_SUFFIX, write)
+
+    def clear(self):
+        """Delete every file of the cache."""
+        with self._lock:
+            for path, _, _ in self._files():
+                _remove(path)
+            self.nbytes = 0
+
+    def _disable(self, error):
+        print(f'Disk cache in {self.folder} disabled: {error}')
+        self.enabled = False
+
+    def _path(self, key, suffix):
+        # repr of tuples of strings and numbers, the same in every process
+        return osp.join(self.folder, hashlib.sha1(repr(key).encode()).hexdigest() + suffix)
+
+    def _read(self, key, suffix, read):
+        if not self.enabled:
+            self.stats['misses'] += 1
+            return None
+        path = self._path(key, suffix)
+        try:
+            value = read(path)
+        except FileNotFoundError:
+            self.stats['misses'] += 1
+            return None
+        except Exception as e:
+            print(f'Unreadable cache file {path} deleted: {e}')
+            _remove(path)
+            self.stats['misses'] += 1
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass  # Evicted meanwhile by another process
+        self.stats['hits'] += 1
+        return value
+
+    def _write(self, key, suffix, write):
+        if not self.enabled:
+            return
+        path = self._path(key, suffix)
+        tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+        try:
+            write(tmp_path)
+            size = osp.getsize(tmp_path)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            # Read-only or full folder: every later write would fail the same way
+            _remove(tmp_path)
+            self._disable(e)
+            return
+        except Exception as e:
+            # A column Parquet can not store only costs this entry, the caller has its value
+            print(f'Cache file {path} not written: {e}')
+            _remove(tmp_path)
+            return
+        with self._lock:
+            self.nbytes += size
+            if self.nbytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Delete the least recently used files until the folder is under max_bytes."""
+        # Listed again: other processes share the folder and the running total drifts
+        files = sorted(self._files(), key=lambda file: file[2])
+        self.nbytes = sum(size for _, size, _ in files)
+        for path, size, _ in files:
+            if self.nbytes <= self.max_bytes:
+                break
+            if _remove(path):
+                self.stats['evictions'] += 1
+            self.nbytes -= size
+
+    def _files(self):
+        """(path, size, modification time) of the cache files."""
+        files = []
+        try:
+            entries = list(os.scandir(self.folder))
+        except OSError:
+            return files  # Removed or unreadable folder, nothing to count or evict
+        for entry in entries:
+            if entry.name.endswith((FRAME_SUFFIX, TEXT_SUFFIX)):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                files.append((entry.path, stat.st_size, stat.st_mtime_ns))
+        return files
+
+
+def _read_frame(path):
+    table = pq.read_table(path)
+    df = table.to_pandas()
+    # Categoricals without categories (empty or all-null columns) are read back as objects
+    for column in (table.schema.pandas_metadata or {}).get('columns', []):
+        name = column['name']
+        if column['pandas_type'] == 'categorical' and name in df.columns and df[name].dtype == object:
+            df[name] = df[name].astype('category')
+    return df
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+        return True
+    except OSError:
+        return False
@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+
+from database_operations.tables_schema import stats_schema
+
+
+def _is_text(col_type):
+    return col_type.upper() == 'TEXT'
+
+
+# Largest relative change float32 may bring to a value: 1234.56 becomes 1234.5600586, far below
+# the decimals shown by the reports
+FLOAT32_RTOL = 1e-6
+
+
+def _compact_float(values):
+    """float32 when every value survives the round trip within FLOAT32_RTOL, float64 otherwise."""
+    values = pd.to_numeric(values, errors='coerce').astype(np.float64)
+    compact = values.astype(np.float32)
+    array, compact_array = values.to_numpy(), compact.to_numpy().astype(np.float64)
+    close = np.allclose(compact_array, array, rtol=FLOAT32_RTOL, atol=0, equal_nan=True)
+    return compact if close else values
+
+
+def _compact_integer(values):
+    """
+    int32 for complete integer columns, floats otherwise (missing or fractional values).
+
+    The reports total values with the builtin sum, which keeps the numpy scalar type, so
+    int16 could wrap around on season totals: int32 is the smallest safe type.
+    """
+    values = pd.to_numeric(values, errors='coerce')
+    if values.notna().all() and (values % 1 == 0).all() and (values.abs() < 2 ** 31).all():
+        return values.astype(np.int32)
+    return _compact_float(values)
+
+
+def apply_dtype_policy(df, schema=stats_schema):
+    """
+    Convert the columns of a frame to the compact dtypes of their schema types.
+
+    - TEXT columns (Player, type, category) become categoricals.
+    - Date columns become datetime64[ns].
+    - REAL columns become float32 when no value changes by more than FLOAT32_RTOL (relative),
+      e.g. decimal meters or speeds, and stay float64 otherwise (values beyond the float32
+      range or precision), so the values shown in the reports keep their decimals.
+    - INTEGER columns become int32, or floats when they have missing values.
+
+    Columns not in the schema are left as they are.
+
+    Args:
+    - df (DataFrame): Frame as returned by select_from.
+    - schema (dict): Column names and types. Default is stats_schema.
+
+    Returns:
+    - pd.DataFrame: A new frame with the compact dtypes.
+    """
+    compact = {}
+    for col in df.columns:
+        col_type = schema.get(col)
+        values = df[col]
+        if col_type is None:
+            compact[col] = values
+        elif _is_text(col_type):
+            compact[col] = values.astype('category')
+        elif col_type == 'Date':
+            compact[col] = values if pd.api.types.is_datetime64_dtype(values) else pd.to_datetime(values, format='%Y-%m-%d')
+        elif col_type == 'INTEGER':
+            compact[col] = _compact_integer(values)
+        elif col_type == 'REAL':
+            compact[col] = _compact_float(values)
+        else:
+            compact[col] = values
+    return pd.DataFrame(compact, index=df.index)
+
+
+def memory_report(before, after):
+    """
+    Compare the memory used by a frame before and after apply_dtype_policy.
+
+    Args:
+    - before (DataFrame): Frame with the dtypes of the database driver.
+    - after (DataFrame): Same frame with the compact dtypes.
+
+    Returns:
+    - pd.DataFrame: One row per column with the dtypes and bytes before and after, plus a 'Total' row.
+    """
+    report = pd.DataFrame({
+        'dtype_before': before.dtypes.astype(str),
+        'dtype_after': after.dtypes.astype(str),
+        'bytes_before': before.memory_usage(index=False, deep=True),
+        'bytes_after': after.memory_usage(index=False, deep=True),
+    })
+    report.loc['Total'] = ['', '', report['bytes_before'].sum(), report['bytes_after'].sum()]
+    report['saved'] = 1 - report['bytes_after'] / report['bytes_before']
+    return report
@@ -0,0 +1,158 @@
+import os.path as osp
+import threading
+from urllib.parse import quote
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import QueuePool
+
+
+# Pool settings per engine role. Readers share a pool of connections, while writers go
+# through a single connection so SQLite never sees two writers of the same process.
+ENGINE_ROLES = {
+    'read': {
+        'pool_size': 5,
+        'max_overflow': 10,
+        'pool_timeout': 30,
+    },
+    'write': {
+        'pool_size': 1,
+        'max_overflow': 0,
+        'pool_timeout': 60,
+    },
+}
+
+# SQLite settings applied to every new connection. 'read_only' opens the database with a
+# read-only URI, the other keys are PRAGMAs. journal_mode=WAL is persistent in the database file,
+# so once an ingest connection set it the dashboard readers no longer block on writers.
+SQLITE_PROFILES = {
+    'sqlite_default': {},
+    'ingest': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',       # With WAL only a power loss can lose the last commits
+        'cache_size': -64000,          # Negative values are KiB, 64 MB
+        'mmap_size': 268435456,        # 256 MB
+        'temp_store': 'MEMORY',
+    },
+    'dashboard': {
+        'read_only': True,
+        'cache_size': -32000,
+        'mmap_size': 268435456,
+        'temp_store': 'MEMORY',
+    },
+}
+
+# Profile used by each engine role when none is given
+ROLE_PROFILES = {
+    'read': 'dashboard',
+    'write': 'ingest',
+}
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def apply_profile(engine, profile):
+    """
+    Apply the PRAGMAs of a SQLite profile on every connection the engine opens.
+
+    The read-only mode is part of the database URL, see get_engine.
+
+    Args:
+    - engine: SQLAlchemy Engine object.
+    - profile (str): One of SQLITE_PROFILES keys.
+
+    Returns:
+    - Engine: The same engine.
+    """
+    pragmas = {key: value for key, value in SQLITE_PROFILES[profile].items() if key != 'read_only'}
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma, value in pragmas.items():
+            cursor.execute(f'PRAGMA {pragma}={value}')
+        cursor.close()
+
+    return engine
+
+
+def sqlite_url(db_path, read_only=False):
+    """Return the SQLAlchemy URL of a SQLite database, optionally opened read-only."""
+    if read_only:
+        # Percent-encoded, a '?', '#' or '%' of the path would be read as part of the URI
+        return f'sqlite:///file:{quote(osp.abspath(db_path))}?mode=ro&uri=true'
+    return f'sqlite:///{db_path}'
+
+
+def get_engine(db_path, role='read', profile=None):
+    """
+    Return the long-lived, pooled engine of the database for the given role.
+
+    Engines are created once per (absolute db path, role, profile) and shared by the whole
+    process, so callers must not dispose them.
+
+    Args:
+    - db_path (str): Path of the SQLite database.
+    - role (str): One of ENGINE_ROLES keys, 'read' or 'write'. Default is 'read'.
+    - profile (str, optional): One of SQLITE_PROFILES keys. Defaults to the one of the role in ROLE_PROFILES.
+
+    Returns:
+    - Engine: SQLAlchemy Engine object.
+    """
+    if role not in ENGINE_ROLES:
+        raise ValueError(f"Unknown engine role '{role}', expected one of {list(ENGINE_ROLES)}")
+    profile = profile or ROLE_PROFILES[role]
+    if profile not in SQLITE_PROFILES:
+        raise ValueError(f"Unknown SQLite profile '{profile}', expected one of {list(SQLITE_PROFILES)}")
+
+    key = (osp.abspath(db_path), role, profile)
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is None:
+            engine = create_engine(
+                sqlite_url(db_path, read_only=SQLITE_PROFILES[profile].get('read_only', False)),
+                echo=False,
+                poolclass=QueuePool,
+                # Pooled connections are handed to whichever thread runs the Streamlit session
+                connect_args={'check_same_thread': False},
+                **ENGINE_ROLES[role],
+            )
+            _engines[key] = apply_profile(engine, profile)
+
+    return engine
+
+
+def dispose_engines(db_path=None):
+    """
+    Dispose the registered engines and remove them from the registry.
+
+    Args:
+    - db_path (str, optional): Only dispose the engines of this database. Defaults to all of them.
+
+    Returns:
+    None
+    """
+    with _engines_lock:
+        keys = [key for key in _engines if db_path is None or key[0] == osp.abspath(db_path)]
+        for key in keys:
+            _engines.pop(key).dispose()
+
+
+def checkpoint(db_path):
+    """
+    Move the committed transactions of the write-ahead log into the database file and empty the log.
+
+    Once an ingest connection switched the database to WAL, recent commits may only be in the
+    -wal file: checkpoint before copying or uploading the database file alone.
+
+    Args:
+    - db_path (str): Path of the SQLite database.
+
+    Returns:
+    - bool: True if the whole log was moved, False if readers kept part of it or the database is not in WAL mode.
+    """
+    if not osp.exists(f'{db_path}-wal'):
+        return False
+    with get_engine(db_path, role='write').connect() as connection:
+        busy, log_frames, checkpointed = connection.exec_driver_sql('PRAGMA wal_checkpoint(TRUNCATE)').fetchone()
+    return not busy and log_frames == checkpointed
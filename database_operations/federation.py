@@ -0,0 +1,369 @@
+import json
+import os.path as osp
+import sqlite3
+import threading
+from functools import lru_cache
+from urllib.parse import quote
+
+import pandas as pd
+import pyarrow as pa
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.pool import QueuePool
+
+from database_operations.data_version import file_fingerprint
+from database_operations.engines import ENGINE_ROLES
+from database_operations.query_builder import _bind_params, _conditions, filter_shape, quote_identifier
+
+
+# A federation is a JSON file mapping season labels to SQLite databases, e.g.
+# {"22_23": "spezia_22_23.db", "23_24": "spezia_23_24.db"}, paths relative to the JSON file
+FEDERATION_PATH = osp.join('data', 'seasons.json')
+SEASON_COLUMN = 'season'
+FEDERATED_TABLES = ['stats', 'file_available']
+
+# Column whose range is recorded per season file to prune the queries
+RANGE_COLUMN = 'date'
+
+_engines = {}
+_ranges = {}
+_lock = threading.Lock()
+
+
+def is_federation(path):
+    """Return True if the path is a federation file rather than a SQLite file or a Parquet store."""
+    return str(path).endswith('.json') and osp.isfile(path)
+
+
+def load_seasons(federation_path):
+    """
+    Read the seasons of a federation.
+
+    Args:
+    - federation_path (str): Path of the federation JSON file.
+
+    Returns:
+    - dict: Season label -> absolute path of its SQLite database, in the order of the file.
+    """
+    with open(federation_path) as f:
+        seasons = json.load(f)
+    folder = osp.dirname(osp.abspath(federation_path))
+    return {str(season): osp.abspath(osp.join(folder, db_path)) for season, db_path in seasons.items()}
+
+
+def write_federation(federation_path, seasons):
+    """
+    Write a federation file.
+
+    Args:
+    - federation_path (str): Path of the federation JSON file.
+    - seasons (dict): Season label -> path of its SQLite database, oldest season first.
+
+    Returns:
+    - str: Path of the federation file.
+    """
+    folder = osp.dirname(osp.abspath(federation_path))
+    seasons = {season: osp.relpath(osp.abspath(db_path), folder) for season, db_path in seasons.items()}
+    with open(federation_path, 'w') as f:
+        json.dump(seasons, f, indent=4)
+    return federation_path
+
+
+def _schema_name(i):
+    return f'season_{i}'
+
+
+def _attached_columns(dbapi_connection, schema, table_name):
+    rows = dbapi_connection.execute(f'PRAGMA {schema}.table_info({quote_identifier(table_name)})').fetchall()
+    return tuple(row[1] for row in rows)
+
+
+def _union_columns(branches):
+    """Columns of the logical table: the ones of every season, in order of appearance, then the season."""
+    columns = dict.fromkeys(col for _, _, branch_columns in branches for col in branch_columns)
+    return tuple(columns) + (SEASON_COLUMN,)
+
+
+def _branch_select(schema, from_table, branch_columns, columns, season_sql):
+    """SELECT of one season: columns missing from its file are NULL, the season is the season_sql value."""
+    select = ', '.join([
+        f'{season_sql} AS {quote_identifier(col)}' if col == SEASON_COLUMN
+        else quote_identifier(col) if col in branch_columns
+        else f'NULL AS {quote_identifier(col)}'
+        for col in columns
+    ])
+    return f'SELECT {select} FROM {schema}.{quote_identifier(from_table)}'
+
+
+def _create_views(dbapi_connection, seasons):
+    """Create the TEMP views exposing every federated table as the UNION ALL of the seasons."""
+    for table_name in FEDERATED_TABLES:
+        branches = [
+            (_schema_name(i), season, _attached_columns(dbapi_connection, _schema_name(i), table_name))
+            for i, season in enumerate(seasons)
+        ]
+        branches = [branch for branch in branches if branch[2]]
+        if not branches:
+            continue
+        columns = _union_columns(branches)
+        union = ' UNION ALL '.join([
+            _branch_select(schema, table_name, branch_columns, columns, "'" + season.replace("'", "''") + "'")
+            for schema, season, branch_columns in branches
+        ])
+        dbapi_connection.execute(f'CREATE TEMP VIEW {quote_identifier(table_name)} AS {union}')
+
+
+def get_engine(federation_path):
+    """
+    Return the pooled engine of a federation.
+
+    Every connection is an in-memory database with the season files attached read-only as
+    season_0, season_1, ... and TEMP views named after the federated tables (stats,
+    file_available) holding the rows of every season with a season column. The engine is
+    created again when the federation file lists other seasons.
+
+    Args:
+    - federation_path (str): Path of the federation JSON file.
+
+    Returns:
+    - Engine: SQLAlchemy Engine object.
+    """
+    seasons = load_seasons(federation_path)
+    key = (osp.abspath(federation_path), tuple(seasons.items()))
+
+    with _lock:
+        engine = _engines.get(key)
+        if engine is None:
+            def connect():
+                connection = sqlite3.connect(':memory:', uri=True, check_same_thread=False)
+                limit = connection.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+                if len(seasons) > limit:
+                    connection.close()
+                    raise ValueError(f'A federation holds at most {limit} seasons, {federation_path} lists {len(seasons)}')
+                return connection
+
+            engine = create_engine('sqlite://', creator=connect, poolclass=QueuePool, **ENGINE_ROLES['read'])
+
+            @event.listens_for(engine, 'connect')
+            def attach_seasons(dbapi_connection, connection_record):
+                for i, db_path in enumerate(seasons.values()):
+                    uri = f'file:{quote(db_path)}?mode=ro'
+                    dbapi_connection.execute(f"ATTACH DATABASE ? AS {_schema_name(i)}", (uri,))
+                _create_views(dbapi_connection, list(seasons))
+
+            # Engines of an older version of the file are no longer used
+            for old_key in [k for k in _engines if k[0] == key[0]]:
+                _engines.pop(old_key).dispose()
+            _engines[key] = engine
+
+    return engine
+
+
+def _season_range(dbapi_connection, schema, db_path, table_name):
+    """
+    Return the first and last date of a table of one season, as 'YYYY-MM-DD' strings.
+
+    (None, None) if the table is empty, None if it has no date column. The range is cached
+    and computed again only when the season database changes.
+    """
+    fingerprint = file_fingerprint(db_path)
+    with _lock:
+        cached = _ranges.get((db_path, table_name))
+    if cached is not None and cached[0] == fingerprint:
+        return cached[1]
+
+    date_range = None
+    if RANGE_COLUMN in _attached_columns(dbapi_connection, schema, table_name):
+        # On stats the date leads ix_stats_date_type, MIN and MAX are two index lookups
+        date_range = tuple(dbapi_connection.execute(
+            f'SELECT MIN({quote_identifier(RANGE_COLUMN)}), MAX({quote_identifier(RANGE_COLUMN)}) '
+            f'FROM {schema}.{quote_identifier(table_name)}'
+        ).fetchone())
+
+    with _lock:
+        _ranges[(db_path, table_name)] = (fingerprint, date_range)
+    return date_range
+
+
+def _range_overlaps(date_range, filters):
+    """Return False when the filters on the range column exclude every date of the range."""
+    if date_range is None:
+        return True
+    first, last = date_range
+    if first is None:
+        return False
+
+    for column, operator, value in filters:
+        if column != RANGE_COLUMN:
+            continue
+        operator = operator.upper()
+        values = [str(v) for v in value] if operator == 'IN' else [str(value)]
+        if operator in ('=', 'IN') and not any(first <= v <= last for v in values):
+            return False
+        if (operator == '>=' and last < values[0]) or (operator == '>' and last <= values[0]):
+            return False
+        if (operator == '<=' and first > values[0]) or (operator == '<' and first >= values[0]):
+            return False
+    return True
+
+
+def _season_matches(season, filters):
+    """Apply the filters on the season column, which is constant within a season file."""
+    operators = {
+        '=': lambda v: season == str(v),
+        '!=': lambda v: season != str(v),
+        '<': lambda v: season < str(v),
+        '<=': lambda v: season <= str(v),
+        '>': lambda v: season > str(v),
+        '>=': lambda v: season >= str(v),
+        'IN': lambda v: season in [str(x) for x in v],
+    }
+    return all(operators[operator.upper()](value) for column, operator, value in filters if column == SEASON_COLUMN)
+
+
+def prune_seasons(federation_path, from_table, where_condition=None):
+    """
+    Return the seasons a query has to read.
+
+    A season is skipped when the filters on the season column exclude it, when its date range
+    does not overlap the filters on the date, or when it lacks a filtered column.
+
+    Args:
+    - federation_path (str): Path of the federation JSON file.
+    - from_table (str): Federated table.
+    - where_condition (list, optional): List of (column, operator, value) filters.
+
+    Returns:
+    - list: (attached schema, season, columns of the table in that season) of the seasons to read.
+    """
+    filters = list(where_condition or [])
+    filtered_columns = {column for column, _, _ in filters if column != SEASON_COLUMN}
+
+    branches = []
+    with get_engine(federation_path).connect() as connection:
+        dbapi_connection = connection.connection.dbapi_connection
+        for i, (season, db_path) in enumerate(load_seasons(federation_path).items()):
+            schema = _schema_name(i)
+            columns = _attached_columns(dbapi_connection, schema, from_table)
+            # Comparisons with the NULL of a missing column are never true
+            if not columns or not _season_matches(season, filters) or not filtered_columns <= set(columns):
+                continue
+            if _range_overlaps(_season_range(dbapi_connection, schema, db_path, from_table), filters):
+                branches.append((schema, season, columns))
+    return branches
+
+
+@lru_cache(maxsize=256)
+def compile_federated_select(from_table, branches, columns, shape=()):
+    """
+    Build the parameterized UNION ALL statement reading a table from the given seasons.
+
+    The filters are repeated in every branch, so each season file uses its own indexes.
+    Filters on the season column are left out, prune_seasons already applied them.
+
+    Args:
+    - from_table (str): Federated table.
+    - branches (tuple): Tuple of (attached schema, season, columns), see prune_seasons.
+    - columns (tuple): Columns to select, the season column included.
+    - shape (tuple): Shape of the filters, see query_builder.filter_shape.
+
+    Returns:
+    - TextClause: Statement with the bound parameters :p0, :p1, ... and :s0, :s1, ... for the seasons.
+    """
+    conditions = [
+        condition for condition, (column, _, _) in zip(_conditions(shape, quote_identifier), shape)
+        if column != SEASON_COLUMN
+    ]
+    where = ' WHERE ' + ' AND '.join(conditions) if conditions else ''
+    return text(' UNION ALL '.join([
+        _branch_select(schema, from_table, branch_columns, columns, f':s{i}') + where
+        for i, (schema, _, branch_columns) in enumerate(branches)
+    ]))
+
+
+def table_shape(federation_path, table_name):
+    """
+    Return the (rows, columns) of a federated table: the rows of the attached seasons
+    counted by SQLite, and the columns of their union, season included.
+
+    Args:
+    - federation_path (str): Path of the federation JSON file.
+    - table_name (str): Federated table, 'stats' or 'file_available'.
+
+    Returns:
+    - tuple: Number of rows and of columns.
+    """
+    n_rows, branches = 0, []
+    with get_engine(federation_path).connect() as connection:
+        dbapi_connection = connection.connection.dbapi_connection
+        for i, season in enumerate(load_seasons(federation_path)):
+            schema = _schema_name(i)
+            columns = _attached_columns(dbapi_connection, schema, table_name)
+            if not columns:
+                continue
+            branches.append((schema, season, columns))
+            n_rows += dbapi_connection.execute(
+                f'SELECT COUNT(*) FROM {schema}.{quote_identifier(table_name)}'
+            ).fetchone()[0]
+    return n_rows, len(_union_columns(branches)) if branches else 0
+
+
+def _federated_statement(federation_path, from_table, cols_to_select, where_condition):
+    """Return the (statement, params, columns) of select_from and iter_select_from, statement None if no season is read."""
+    if isinstance(where_condition, str):
+        raise ValueError('Raw SQL conditions are not pruned, query the federated views of get_engine instead')
+
+    filters = list(where_condition or [])
+    branches = tuple(prune_seasons(federation_path, from_table, filters))
+    columns = tuple(cols_to_select) or _union_columns(branches)
+    if not branches:
+        return None, {}, columns
+
+    params = _bind_params(filters)
+    params.update({f's{i}': season for i, (_, season, _) in enumerate(branches)})
+    return compile_federated_select(from_table, branches, columns, filter_shape(filters)), params, columns
+
+
+def select_from(federation_path, from_table, cols_to_select=[], where_condition=None):
+    """
+    Perform a SELECT on a federated table, the counterpart of sql_queries.select_from.
+
+    Only the season files whose rows can match the filters are read, see prune_seasons.
+    The rows come season after season, in the order of the federation file.
+
+    Args:
+    - federation_path (str): Path of the federation JSON file.
+    - from_table (str): Federated table, 'stats' or 'file_available'.
+    - cols_to_select (list, optional): Columns to select, 'season' included. If empty, selects all columns.
+    - where_condition (list, optional): List of (column, operator, value) filters, 'season' included.
+
+    Returns:
+    - pd.DataFrame: DataFrame containing the selected rows.
+    """
+    statement, params, columns = _federated_statement(federation_path, from_table, cols_to_select, where_condition)
+    if statement is None:
+        return pd.DataFrame(columns=list(columns))
+    return pd.read_sql_query(statement, con=get_engine(federation_path), params=params)
+
+
+def iter_select_from(federation_path, from_table, cols_to_select=[], where_condition=None, chunk_size=10000, arrow=False):
+    """
+    Streaming variant of select_from, yielding the rows in chunks of at most chunk_size.
+
+    Args:
+    - federation_path (str): Path of the federation JSON file.
+    - from_table (str): Federated table, 'stats' or 'file_available'.
+    - cols_to_select (list, optional): Columns to select. If empty, selects all columns.
+    - where_condition (list, optional): List of (column, operator, value) filters.
+    - chunk_size (int): Maximum number of rows per chunk. Default is 10000.
+    - arrow (bool): Yield pyarrow RecordBatches instead of DataFrames. Default is False.
+
+    Yields:
+    - pd.DataFrame or pa.RecordBatch: The next chunk of rows.
+    """
+    statement, params, _ = _federated_statement(federation_path, from_table, cols_to_select, where_condition)
+    if statement is None:
+        return
+    engine = get_engine(federation_path)
+    with engine.connect().execution_options(stream_results=True, max_row_buffer=chunk_size) as connection:
+        for chunk in pd.read_sql_query(statement, con=connection, params=params, chunksize=chunk_size):
+            yield pa.RecordBatch.from_pandas(chunk, preserve_index=False) if arrow else chunk
@@ -0,0 +1,318 @@
+import argparse
+import hashlib
+import io
+import json
+import os
+import os.path as osp
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+from sqlalchemy import text
+
+from database_operations.engines import checkpoint, get_engine
+from database_operations.ingest_queue import IngestQueue
+from database_operations.migrations import migrate_database
+from database_operations.query_builder import quote_identifier
+from database_operations.rollups import refresh_rollups
+from database_operations.sql_queries import create_table, primary_key_columns, reflect_table, upsert_rows
+from database_operations.tables_indexes import create_indexes, table_columns
+from database_operations.tables_schema import (file_available_pk, file_available_schema, ingest_manifest_pk,
+                                               ingest_manifest_schema, stats_schema, stats_schema_pk)
+from web_utils.data_manipulation import parse_durations
+
+
+CSV_FOLDER = osp.join('data', 'csv')
+
+# Columns holding durations as 'HH:MM:SS' strings, 'type' is lower case so it is not one of them
+TIME_COLUMNS = [col for col in stats_schema if col.startswith('T')]
+
+
+def session_from_file_name(file_name):
+    """
+    Read the session date and type from a file named '<YYYY>_<MM>_<DD>_<type>.csv'.
+
+    Args:
+    - file_name (str): Name or path of the CSV file.
+
+    Returns:
+    - tuple: (date as a 'YYYY-MM-DD' string, session type).
+    """
+    f_split = osp.splitext(osp.basename(file_name))[0].split('_')
+    return '-'.join(f_split[:-1]), f_split[-1]
+
+
+def list_session_files(csv_folder=CSV_FOLDER):
+    """Return the paths of the session CSV files of a folder, sorted by name (and so by date)."""
+    return sorted(osp.join(csv_folder, f) for f in os.listdir(csv_folder) if f.endswith('.csv'))
+
+
+def parse_session_file(csv_path, category=None, content=None):
+    """
+    Read a session CSV export into rows of the stats table.
+
+    Args:
+    - csv_path (str): Path of the CSV file, ';' separated with the players as first column.
+    - category (str, optional): Value of the category column. Left out if None.
+    - content (bytes, optional): Content of the file when it was already read.
+
+    Returns:
+    - pd.DataFrame: One row per player with the metrics, the durations in seconds, date and type.
+    """
+    session_date, session_type = session_from_file_name(csv_path)
+
+    df = pd.read_csv(csv_path if content is None else io.BytesIO(content), sep=';', index_col=0, decimal=',')
+    df = df.reset_index(names='Player')
+    time_columns = [col for col in TIME_COLUMNS if col in df.columns]
+    df[time_columns] = parse_durations(df[time_columns])
+
+    df['date'] = session_date
+    df['type'] = session_type
+    if category is not None:
+        df['category'] = category
+
+    return df
+
+
+def _create_ingest_tables(engine):
+    """Create the stats, file_available and ingest_manifest tables if they don't exist yet, and migrate the existing ones."""
+    create_table(engine, 'stats', stats_schema, stats_schema_pk)
+    create_table(engine, 'file_available', file_available_schema, file_available_pk)
+    create_table(engine, 'ingest_manifest', ingest_manifest_schema, ingest_manifest_pk)
+    # The dashboard only adds new columns, primary key changes are applied before writing (columns are never dropped)
+    migrate_database(engine)
+    # Before the first write, building the indexes of an empty table is free
+    create_indexes(engine, 'stats')
+
+
+def source_stat(csv_path):
+    """Return the manifest identity of a file: absolute path, size and mtime in nanoseconds."""
+    stat = os.stat(csv_path)
+    return {'path': osp.abspath(csv_path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def load_manifest(engine):
+    """
+    Return the ingest manifest of the database.
+
+    Args:
+    - engine: SQLAlchemy Engine object for database connection.
+
+    Returns:
+    - dict: path -> {'size', 'mtime_ns', 'hash'} of every file already loaded.
+    """
+    with engine.connect() as connection:
+        rows = connection.execute(text('SELECT `path`, `size`, `mtime_ns`, `hash` FROM `ingest_manifest`')).fetchall()
+    return {row[0]: {'size': row[1], 'mtime_ns': row[2], 'hash': row[3]} for row in rows}
+
+
+def read_source(csv_path, category=None, known_hash=None):
+    """
+    Hash a source file and parse it unless its content is the one already loaded.
+
+    Args:
+    - csv_path (str): Path of the CSV file.
+    - category (str, optional): Value of the category column, see parse_session_file.
+    - known_hash (str, optional): Hash recorded in the manifest for the path.
+
+    Returns:
+    - tuple: (manifest record of the file, parsed DataFrame or None if the content is unchanged).
+    """
+    source = source_stat(csv_path)
+    with open(csv_path, 'rb') as f:
+        content = f.read()
+    source['hash'] = hashlib.sha256(content).hexdigest()
+
+    if source['hash'] == known_hash:
+        return source, None
+    return source, parse_session_file(csv_path, category, content)
+
+
+def _delete_keys(connection, table_name, primary_keys, keys):
+    """Delete the rows of a table with the given primary key values, NULL keys included."""
+    where = ' AND '.join([f'{quote_identifier(key)} IS ?' for key in primary_keys])
+    connection.exec_driver_sql(f'DELETE FROM {quote_identifier(table_name)} WHERE {where}', [tuple(k) for k in keys])
+
+
+def write_session(engine, df, source=None):
+    """
+    Upsert the rows of one session and record it in file_available, in a single transaction.
+
+    See write_session_rows, which runs inside the caller's transaction.
+
+    Args:
+    - engine: SQLAlchemy Engine object for database connection.
+    - df (DataFrame): Rows of one session, as returned by parse_session_file.
+    - source (dict, optional): 'path', 'size', 'mtime_ns' and 'hash' of the file the rows come from.
+
+    Returns:
+    - dict: Number of stats rows 'inserted', 'updated' and 'deleted'.
+    """
+    with engine.begin() as connection:
+        return write_session_rows(connection, df, source)
+
+
+def write_session_rows(connection, df, source=None):
+    """
+    Upsert the rows of one session and record it in file_available.
+
+    When the manifest record of the source file is given, the rows that an earlier version of
+    the file produced and the new one doesn't (e.g. a player removed from the export) are
+    deleted, and the manifest is updated with the new keys in the same transaction.
+    Columns missing from the live tables (e.g. category on older databases) are left out.
+
+    Args:
+    - connection: SQLAlchemy Connection object, inside an open transaction.
+    - df (DataFrame): Rows of one session, as returned by parse_session_file.
+    - source (dict, optional): 'path', 'size', 'mtime_ns' and 'hash' of the file the rows come from.
+
+    Returns:
+    - dict: Number of stats rows 'inserted', 'updated' and 'deleted'.
+    """
+    # The live layouts come from the reflection cache, not from a PRAGMA per file
+    stats_columns = reflect_table(connection, 'stats').columns.keys()
+    stats = df[[col for col in df.columns if col in stats_columns]]
+    stats_keys = primary_key_columns(connection, 'stats')
+    result = upsert_rows(connection, 'stats', stats, stats_keys, disable_pb=True)
+
+    file_columns = reflect_table(connection, 'file_available').columns.keys()
+    record = df[[col for col in file_available_schema if col in file_columns and col in df.columns]].iloc[:1]
+    upsert_rows(connection, 'file_available', record, primary_key_columns(connection, 'file_available'),
+                disable_pb=True)
+
+    result['deleted'] = 0
+    if source is not None:
+        new_keys = stats[stats_keys].astype(object).where(stats[stats_keys].notna(), None).values.tolist()
+        previous = connection.execute(
+            text('SELECT `primary_keys` FROM `ingest_manifest` WHERE `path` = :path'), {'path': source['path']}
+        ).scalar()
+        if previous is not None:
+            new_set = {tuple(k) for k in new_keys}
+            stale = [k for k in json.loads(previous) if tuple(k) not in new_set]
+            if stale:
+                _delete_keys(connection, 'stats', stats_keys, stale)
+                refresh_rollups(connection, 'stats', pd.DataFrame(stale, columns=stats_keys))
+            result['deleted'] = len(stale)
+
+        manifest = pd.DataFrame([{
+            **source,
+            'date': record['date'].iloc[0],
+            'type': record['type'].iloc[0],
+            'primary_keys': json.dumps(new_keys),
+        }])
+        upsert_rows(connection, 'ingest_manifest', manifest, ingest_manifest_pk, disable_pb=True)
+
+    return result
+
+
+def _touch_manifest(connection, source):
+    """Record the new size and mtime of a file whose content did not change."""
+    connection.execute(
+        text('UPDATE `ingest_manifest` SET `size` = :size, `mtime_ns` = :mtime_ns WHERE `path` = :path'), source
+    )
+
+
+def ingest_folder(db_path, csv_folder=CSV_FOLDER, category=None, workers=None, force=False, max_batch=32):
+    """
+    Load the session CSV files of a folder in the database.
+
+    Files are hashed and parsed in a process pool and each parsed file is queued to the single
+    writer of the database (see IngestQueue) as soon as it is ready, which commits the queued
+    files in bounded batches while the dashboard keeps reading. The ingest_manifest table records the size, mtime and
+    content hash of every loaded file: files whose size and mtime did not change are skipped
+    without being read, files whose content hash did not change are skipped without being
+    parsed, and changed files replace the rows they produced before.
+
+    Args:
+    - db_path (str): Path of the SQLite database, created if missing.
+    - csv_folder (str): Folder with the '<YYYY>_<MM>_<DD>_<type>.csv' files. Default is data/csv.
+    - category (str, optional): Category of the sessions, required if the stats table has a category column.
+      Refused while the table has rows without category, see the --category option of migrations.
+    - workers (int, optional): Number of processes. Defaults to the number of CPUs.
+    - force (bool): Load every file, even the unchanged ones. Default is False.
+    - max_batch (int): Maximum number of files per transaction. Default is 32.
+
+    Returns:
+    - dict: Number of 'files' loaded, stats 'rows' written and 'deleted', 'skipped' (unchanged)
+      and 'failed' files, elapsed 'seconds', 'files_per_second' and 'rows_per_second'.
+    """
+    start = time.perf_counter()
+    engine = get_engine(db_path, role='write')
+    _create_ingest_tables(engine)
+    with engine.connect() as connection:
+        if category is None and 'category' in table_columns(connection, 'stats'):
+            raise ValueError("The stats table has a category column, pass the category of the sessions")
+        # Rows loaded before the category column would not be replaced by the same sessions with a category
+        if category is not None and connection.execute(text('SELECT 1 FROM `stats` WHERE `category` IS NULL LIMIT 1')).first():
+            raise ValueError("The stats table has rows without category, set it first with "
+                             "python -m database_operations.migrations <db_path> --category <category>")
+
+    files = list_session_files(csv_folder)
+    manifest = {} if force else load_manifest(engine)
+
+    pending = []
+    for f in files:
+        source, known = source_stat(f), manifest.get(osp.abspath(f))
+        if known is None or (known['size'], known['mtime_ns']) != (source['size'], source['mtime_ns']):
+            pending.append((f, known['hash'] if known else None))
+
+    n_files, n_rows, n_deleted, n_unchanged, failed = 0, 0, 0, len(files) - len(pending), []
+    writes = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor, IngestQueue(db_path, max_batch=max_batch) as writer:
+        futures = {executor.submit(read_source, f, category, known_hash): f for f, known_hash in pending}
+        for future in as_completed(futures):
+            try:
+                source, df = future.result()
+            except Exception as e:
+                print(f'Error loading {futures[future]}: {e}')
+                failed.append(futures[future])
+                continue
+            if df is None:
+                writes[writer.submit(_touch_manifest, source)] = (futures[future], None)
+            else:
+                writes[writer.submit(write_session_rows, df, source)] = (futures[future], len(df))
+
+    for write, (f, n_file_rows) in writes.items():
+        try:
+            result = write.result()
+        except Exception as e:
+            print(f'Error loading {f}: {e}')
+            failed.append(f)
+            continue
+        if n_file_rows is None:
+            n_unchanged += 1
+            continue
+        n_files += 1
+        n_rows += n_file_rows
+        n_deleted += result['deleted']
+
+    # A copy of the database file alone then holds every ingested session
+    checkpoint(db_path)
+
+    seconds = time.perf_counter() - start
+    return {
+        'files': n_files,
+        'rows': n_rows,
+        'deleted': n_deleted,
+        'skipped': n_unchanged,
+        'failed': len(failed),
+        'seconds': seconds,
+        'files_per_second': n_files / seconds,
+        'rows_per_second': n_rows / seconds,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Load the session CSV exports in the stats table.')
+    parser.add_argument('db_path', help='Path of the SQLite database')
+    parser.add_argument('--csv-folder', default=CSV_FOLDER, help='Folder with the CSV files')
+    parser.add_argument('--category', default=None, help='Category of the sessions, e.g. "First Team"')
+    parser.add_argument('--workers', type=int, default=None, help='Number of parsing processes')
+    parser.add_argument('--force', action='store_true', help='Reload every file, even the unchanged ones')
+    parser.add_argument('--max-batch', type=int, default=32, help='Maximum number of files per transaction')
+    args = parser.parse_args()
+
+    report = ingest_folder(args.db_path, args.csv_folder, args.category, args.workers, args.force, args.max_batch)
+    print(f"Loaded {report['files']} files ({report['rows']} rows) in {report['seconds']:.2f} s: "
+          f"{report['files_per_second']:.1f} files/s, {report['rows_per_second']:.0f} rows/s. "
+          f"Deleted {report['deleted']} stale rows, skipped {report['skipped']} unchanged files, {report['failed']} failed.")
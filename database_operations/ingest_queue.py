@@ -0,0 +1,124 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from database_operations.engines import get_engine
+
+
+_STOP = object()
+
+
+class IngestQueue:
+    """
+    Single writer of a SQLite database.
+
+    Writes are functions of a connection submitted to a queue and run by a background thread,
+    the only user of the 'write' engine (a pool of one connection opened with the WAL 'ingest'
+    profile). The writes already queued are committed together, up to max_batch writes or
+    max_batch_seconds of open transaction, so the write lock is held for bounded periods while
+    the WAL readers of the dashboard keep reading the last committed snapshot.
+
+    When a write fails its batch is rolled back and its writes are run again one transaction
+    each, so only the failing one is lost.
+
+    Args:
+    - db_path (str): Path of the SQLite database.
+    - max_batch (int): Maximum number of writes per transaction. Default is 32.
+    - max_batch_seconds (float): No write is added to a transaction open for longer. Default is 0.2.
+    - max_pending (int): Maximum number of queued writes, submit blocks when it is reached. Default is 256.
+    """
+
+    def __init__(self, db_path, max_batch=32, max_batch_seconds=0.2, max_pending=256):
+        self.engine = get_engine(db_path, role='write')
+        self.max_batch = max_batch
+        self.max_batch_seconds = max_batch_seconds
+        self.stats = {'writes': 0, 'batches': 0, 'failed': 0}
+
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=f'ingest-writer-{db_path}', daemon=True)
+        self._thread.start()
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Queue a write.
+
+        Args:
+        - fn (callable): Called as fn(connection, *args, **kwargs) inside the batch transaction.
+
+        Returns:
+        - Future: Resolves to the value returned by fn once its transaction is committed.
+        """
+        if self._closed:
+            raise RuntimeError('The ingest queue is closed')
+        future = Future()
+        self._queue.put((future, fn, args, kwargs))
+        return future
+
+    def close(self):
+        """Write the queued writes and stop the writer thread."""
+        if not self._closed:
+            self._closed = True
+            self._queue.put(_STOP)
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _run(self):
+        stop = False
+        while not stop:
+            task = self._queue.get()
+            if task is _STOP:
+                break
+            batch, stop = self._write_batch(task)
+            self.stats['batches'] += 1
+            self.stats['writes'] += len(batch)
+
+    def _write_batch(self, task):
+        """Run the task and the ones queued behind it in one transaction, return them and whether to stop."""
+        batch, results, stop = [], [], False
+        try:
+            with self.engine.begin() as connection:
+                start = time.perf_counter()
+                while True:
+                    batch.append(task)
+                    future, fn, args, kwargs = task
+                    results.append(fn(connection, *args, **kwargs))
+                    if len(batch) >= self.max_batch or time.perf_counter() - start >= self.max_batch_seconds:
+                        break
+                    try:
+                        task = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if task is _STOP:
+                        stop = True
+                        break
+        except Exception as e:
+            if len(batch) == 1:
+                self.stats['failed'] += 1
+                batch[0][0].set_exception(e)
+            else:
+                # Isolate the failing write, the others of the batch are committed on their own
+                for task in batch:
+                    self._write_alone(task)
+            return batch, stop
+
+        for (future, _, _, _), result in zip(batch, results):
+            future.set_result(result)
+        return batch, stop
+
+    def _write_alone(self, task):
+        future, fn, args, kwargs = task
+        try:
+            with self.engine.begin() as connection:
+                result = fn(connection, *args, **kwargs)
+        except Exception as e:
+            self.stats['failed'] += 1
+            future.set_exception(e)
+            return
+        future.set_result(result)
@@ -0,0 +1,296 @@
+import argparse
+import hashlib
+import json
+from datetime import datetime
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from database_operations.query_builder import quote_identifier
+from database_operations.rollups import ROLLUP_PERIODS, build_rollup_tables, rollup_sources, rollup_table_name
+from database_operations.sql_queries import invalidate_reflection
+from database_operations.tables_indexes import create_table_indexes, table_columns, tables_indexes
+from database_operations.tables_schema import file_available_pk, file_available_schema, stats_schema, stats_schema_pk
+
+
+# Tables whose live layout follows the declared schemas of tables_schema
+migrated_tables = {
+    'stats': (stats_schema, stats_schema_pk),
+    'file_available': (file_available_schema, file_available_pk),
+}
+
+VERSION_TABLE = 'schema_version'
+
+
+def schema_version(schema, primary_keys, indexes=None):
+    """Version of a declared table layout, a hash of its columns, types, primary keys and secondary indexes."""
+    layout = [list(schema.items()), list(primary_keys)]
+    if indexes:
+        layout.append(sorted(indexes.items()))
+    layout = json.dumps(layout)
+    return hashlib.sha1(layout.encode()).hexdigest()[:12]
+
+
+def applied_versions(connection):
+    """
+    Return the version applied to every table, the only query of an up to date startup.
+
+    Args:
+    - connection: SQLAlchemy Connection object.
+
+    Returns:
+    - dict: Table name -> (version, changes still to apply, e.g. ['primary key changed']),
+      empty if no migration was ever applied.
+    """
+    try:
+        rows = connection.execute(text(f'SELECT `table_name`, `version`, `changes` FROM `{VERSION_TABLE}`')).fetchall()
+    except OperationalError:
+        return {}
+    return {row[0]: (row[1], json.loads(row[2] or '{}').get('pending', [])) for row in rows}
+
+
+def _pending_changes(diff):
+    """Changes of a migrate_table diff left to a rebuild, as readable strings."""
+    if diff['complete']:
+        return []
+    return (['primary key changed'] if diff['primary_key'] else []) + [f'dropped {col}' for col in diff['dropped']]
+
+
+def _report_pending(table_name, pending):
+    print(f"Table '{table_name}' differs from its schema ({', '.join(pending)}), "
+          f"run python -m database_operations.migrations to apply it")
+
+
+def _live_primary_keys(connection, table_name):
+    rows = connection.execute(text(f'PRAGMA table_info({quote_identifier(table_name)})')).fetchall()
+    return [row[1] for row in sorted(rows, key=lambda row: row[5]) if row[5] > 0]
+
+
+def diff_table(connection, table_name, schema, primary_keys):
+    """
+    Compare a declared table layout with the live table.
+
+    Column types are not compared, SQLite keeps whatever is stored in a column.
+
+    Args:
+    - connection: SQLAlchemy Connection object.
+    - table_name (str): Name of the table.
+    - schema (dict): Declared column names and types.
+    - primary_keys (list): Declared primary keys.
+
+    Returns:
+    - dict: 'exists', 'added' columns, 'dropped' columns and whether the primary key changed
+      ('primary_key'), which like dropped columns needs a rebuild of the table.
+    """
+    existing_columns = table_columns(connection, table_name)
+    if not existing_columns:
+        return {'exists': False, 'added': list(schema), 'dropped': [], 'primary_key': False}
+
+    return {
+        'exists': True,
+        'added': [col for col in schema if col not in existing_columns],
+        'dropped': [col for col in existing_columns if col not in schema],
+        'primary_key': _live_primary_keys(connection, table_name) != list(primary_keys),
+    }
+
+
+def _create_statement(table_name, schema, primary_keys):
+    columns = ', '.join([f'{quote_identifier(col)} {col_type}' for col, col_type in schema.items()])
+    keys = ', '.join([quote_identifier(key) for key in primary_keys])
+    return f'CREATE TABLE {quote_identifier(table_name)} ({columns}, PRIMARY KEY ({keys}))'
+
+
+def _live_column_types(connection, table_name):
+    rows = connection.execute(text(f'PRAGMA table_info({quote_identifier(table_name)})')).fetchall()
+    return {row[1]: row[2] for row in rows}
+
+
+def _rebuild_table(connection, table_name, schema, primary_keys):
+    """
+    Rebuild a table with the given layout in one pass: copy the kept columns into a new table,
+    swap it in and recreate the indexes whose columns are all still there.
+    """
+    new_name = f'_migrate_{table_name}'
+    kept = [col for col in schema if col in table_columns(connection, table_name)]
+
+    indexes = []
+    for name, sql in connection.execute(text(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = :table AND sql IS NOT NULL"
+    ), {'table': table_name}).fetchall():
+        index_columns = [row[2] for row in connection.execute(text(f'PRAGMA index_info({quote_identifier(name)})'))]
+        if all(col in schema for col in index_columns):
+            indexes.append(sql)
+        else:
+            print(f"Dropping index '{name}' of table '{table_name}': its columns are not all in the schema")
+
+    cols = ', '.join([quote_identifier(col) for col in kept])
+    connection.execute(text(f'DROP TABLE IF EXISTS {quote_identifier(new_name)}'))
+    connection.execute(text(_create_statement(new_name, schema, primary_keys)))
+    connection.execute(text(
+        f'INSERT INTO {quote_identifier(new_name)} ({cols}) SELECT {cols} FROM {quote_identifier(table_name)}'
+    ))
+    connection.execute(text(f'DROP TABLE {quote_identifier(table_name)}'))
+    connection.execute(text(f'ALTER TABLE {quote_identifier(new_name)} RENAME TO {quote_identifier(table_name)}'))
+    for sql in indexes:
+        connection.execute(text(sql))
+
+
+def migrate_table(connection, table_name, schema, primary_keys, drop_columns=False, rebuild=True):
+    """
+    Bring a live table to its declared layout inside the caller's transaction.
+
+    New columns outside the primary key are added with ALTER TABLE, which only changes the
+    table definition. Primary key changes (and dropped columns, with drop_columns) are applied
+    together by a single rebuild of the table, instead of one table rewrite per DROP COLUMN.
+
+    Columns missing from the declared schema, e.g. added with add_empty_column, are kept unless
+    drop_columns is set: dropping them deletes their data.
+
+    Args:
+    - connection: SQLAlchemy Connection object, inside an open transaction.
+    - table_name (str): Name of the table.
+    - schema (dict): Declared column names and types.
+    - primary_keys (list): Declared primary keys.
+    - drop_columns (bool): Drop the live columns missing from the schema. Default is False.
+    - rebuild (bool): Allow rewriting the table. If False only new columns are added, and the
+      diff tells what is left to apply. Default is True.
+
+    Returns:
+    - dict: The diff, see diff_table, with the undeclared columns 'kept', whether the table was
+      'rebuilt' and whether it is now 'complete' (has the declared layout, kept columns aside).
+    """
+    diff = diff_table(connection, table_name, schema, primary_keys)
+    if not drop_columns:
+        diff['kept'], diff['dropped'] = diff['dropped'], []
+    else:
+        diff['kept'] = []
+    diff['rebuilt'] = False
+    diff['complete'] = True
+
+    if not diff['exists']:
+        connection.execute(text(_create_statement(table_name, schema, primary_keys)))
+    elif (diff['dropped'] or diff['primary_key']) and rebuild:
+        live_types = _live_column_types(connection, table_name)
+        layout = {**schema, **{col: live_types[col] for col in diff['kept']}}
+        _rebuild_table(connection, table_name, layout, primary_keys)
+        diff['rebuilt'] = True
+    else:
+        # New primary key columns too, the pages can read them until the rebuild makes them keys
+        for col in diff['added']:
+            connection.execute(text(
+                f'ALTER TABLE {quote_identifier(table_name)} ADD COLUMN {quote_identifier(col)} {schema[col]}'
+            ))
+        diff['complete'] = not (diff['dropped'] or diff['primary_key'])
+
+    # Created tables have none yet, and the declared ones may have new columns to index
+    create_table_indexes(connection, table_name)
+
+    # The rollup tables hold one column per numeric source column, rebuild the existing ones
+    if table_name in rollup_sources and (diff['added'] or diff['dropped']):
+        existing = {row[0] for row in connection.execute(text("SELECT name FROM sqlite_master WHERE type = 'table'"))}
+        periods = [period for period in ROLLUP_PERIODS if rollup_table_name(table_name, period) in existing]
+        if periods:
+            build_rollup_tables(connection, table_name, periods)
+
+    return diff
+
+
+def migrate_database(engine, tables=None, check_engine=None, drop_columns=False, rebuild=True, category=None):
+    """
+    Apply the pending schema migrations of the database in a single transaction.
+
+    Every migrated table records the version of its declared layout in the schema_version
+    table, so when nothing changed the check costs a single query. A table left with changes
+    to apply (rebuild False) records them with its version: later checks report them from
+    the same query, and apply them once rebuilds are allowed.
+
+    Undeclared columns are only dropped with drop_columns, see the --drop-columns option of
+    the command line.
+
+    Args:
+    - engine: SQLAlchemy Engine object allowed to write, used only if a migration is pending.
+    - tables (dict, optional): Table name -> (schema, primary keys). Defaults to migrated_tables.
+    - check_engine (optional): Engine used for the version check, e.g. a read-only one. Defaults to engine.
+    - drop_columns (bool): Drop the live columns missing from the schemas, every table is checked. Default is False.
+    - rebuild (bool): Allow rewriting tables, e.g. for a primary key change. If False only new
+      columns are added and the rest is reported. Default is True.
+    - category (str, optional): Category given to the rows without one, e.g. the rows loaded
+      before the category column was added. Their sessions can then be loaded again with
+      that category without duplicating them.
+
+    Returns:
+    - dict: Table name -> applied diff (see migrate_table) of the migrated tables, with the
+      changes still 'pending' and the number of 'backfilled' rows, empty if up to date.
+    """
+    tables = tables or migrated_tables
+    versions = {table: schema_version(*layout, tables_indexes.get(table)) for table, layout in tables.items()}
+
+    with (check_engine or engine).connect() as connection:
+        applied = applied_versions(connection)
+    pending = []
+    for table, version in versions.items():
+        applied_version, pending_changes = applied.get(table, (None, []))
+        if drop_columns or applied_version != version or (pending_changes and rebuild):
+            pending.append(table)
+        elif pending_changes:
+            # Recorded by a previous startup, reported again without writing anything
+            _report_pending(table, pending_changes)
+    if not pending and category is None:
+        return {}
+
+    migrations = {}
+    with engine.begin() as connection:
+        connection.execute(text(
+            f'CREATE TABLE IF NOT EXISTS `{VERSION_TABLE}` '
+            f'(`table_name` TEXT PRIMARY KEY, `version` TEXT, `applied_at` TEXT, `changes` TEXT)'
+        ))
+        for table in pending:
+            diff = migrate_table(connection, table, *tables[table], drop_columns=drop_columns, rebuild=rebuild)
+            # A table left with changes records them, the next startups only report them
+            diff['pending'] = _pending_changes(diff)
+            if diff['pending']:
+                _report_pending(table, diff['pending'])
+            connection.execute(text(
+                f'INSERT OR REPLACE INTO `{VERSION_TABLE}` VALUES (:table, :version, :applied_at, :changes)'
+            ), {
+                'table': table,
+                'version': versions[table],
+                'applied_at': datetime.now().isoformat(timespec='seconds'),
+                'changes': json.dumps(diff),
+            })
+            migrations[table] = diff
+
+        if category is not None:
+            for table in tables:
+                if 'category' in table_columns(connection, table):
+                    filled = connection.execute(text(
+                        f'UPDATE {quote_identifier(table)} SET `category` = :category WHERE `category` IS NULL'
+                    ), {'category': category}).rowcount
+                    migrations.setdefault(table, {})['backfilled'] = filled
+
+    # Rebuilt tables and new columns must be reflected again by the write helpers
+    invalidate_reflection(engine)
+    return migrations
+
+
+if __name__ == '__main__':
+    from database_operations.engines import get_engine
+
+    parser = argparse.ArgumentParser(description='Apply the pending schema migrations of a database.')
+    parser.add_argument('db_path', help='Path of the SQLite database')
+    parser.add_argument('--drop-columns', action='store_true',
+                        help='Drop the columns missing from the declared schemas, with their data')
+    parser.add_argument('--category', default=None,
+                        help='Category given to the rows without one, e.g. "First Team"')
+    args = parser.parse_args()
+
+    migrations = migrate_database(get_engine(args.db_path, role='write'), drop_columns=args.drop_columns,
+                                  category=args.category)
+    for table, diff in migrations.items():
+        if 'added' in diff:
+            print(f"{table}: added {diff['added']}, dropped {diff['dropped']}, kept {diff['kept']}"
+                  f"{', primary key changed' if diff['primary_key'] else ''}{', rebuilt' if diff['rebuilt'] else ''}")
+        if 'backfilled' in diff:
+            print(f"{table}: category set on {diff['backfilled']} rows")
+    if not migrations:
+        print('Schema up to date')
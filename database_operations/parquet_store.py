@@ -0,0 +1,246 @@
+import argparse
+import os
+import os.path as osp
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from database_operations.tables_schema import stats_schema, tables_schemas
+
+
+# The stats table is stored as a hive partitioned dataset (category=.../type=...) whose files
+# are sorted by date and cut in row groups of about a week of sessions. Category and type filters
+# prune whole folders and date filters prune row groups through their min/max statistics.
+# A folder per date would create one tiny file per session and make every range scan open
+# hundreds of files.
+STATS_PARTITIONING = ['category', 'type']
+ROWS_PER_GROUP = 7 * 41  # About a week of sessions of a 40 players squad
+
+
+def _partitioning():
+    return ds.partitioning(pa.schema([(col, pa.string()) for col in STATS_PARTITIONING]), flavor='hive')
+
+
+def _table_path(store_path, table_name):
+    if table_name == 'stats':
+        return osp.join(store_path, 'stats')
+    return osp.join(store_path, f'{table_name}.parquet')
+
+
+def is_parquet_store(path):
+    """Return True if the path is a Parquet store written by this module rather than a SQLite file."""
+    return osp.isdir(path) and osp.isdir(_table_path(path, 'stats'))
+
+
+def filters_expression(filters):
+    """
+    Convert a list of (column, operator, value) filters into a pyarrow dataset expression.
+
+    Args:
+    - filters (list): Filters joined with AND, see query_builder.build_select.
+
+    Returns:
+    - Expression: The expression, None if there are no filters.
+    """
+    operators = {
+        '=': lambda f, v: f == v,
+        '!=': lambda f, v: f != v,
+        '<': lambda f, v: f < v,
+        '<=': lambda f, v: f <= v,
+        '>': lambda f, v: f > v,
+        '>=': lambda f, v: f >= v,
+        'IN': lambda f, v: f.isin(list(v)),
+    }
+
+    expression = None
+    for column, operator, value in filters:
+        condition = operators[operator.upper()](pc.field(column), value)
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def _dataset(store_path, table_name):
+    if table_name == 'stats':
+        return ds.dataset(_table_path(store_path, table_name), format='parquet', partitioning=_partitioning())
+    return ds.dataset(_table_path(store_path, table_name), format='parquet')
+
+
+def table_shape(store_path, table_name):
+    """
+    Return the (rows, columns) of a table of the store, from the Parquet footers alone.
+
+    Args:
+    - store_path (str): Path of the Parquet store folder.
+    - table_name (str): Name of the table.
+
+    Returns:
+    - tuple: Number of rows and of columns, partition columns included.
+    """
+    dataset = _dataset(store_path, table_name)
+    return dataset.count_rows(), len(dataset.schema.names)
+
+
+def select_from(store_path, from_table, cols_to_select=[], where_condition=None):
+    """
+    Perform a SELECT on a table of the Parquet store, the counterpart of sql_queries.select_from.
+
+    Filters on the partition columns prune whole sessions, the others are pushed down to the
+    row group statistics, and only the column chunks of the selected columns are read.
+
+    Args:
+    - store_path (str): Root folder of the Parquet store.
+    - from_table (str): Name of the table from which to select.
+    - cols_to_select (list, optional): List of column names to select. If empty, selects all columns.
+    - where_condition (list, optional): List of (column, operator, value) filters.
+
+    Returns:
+    - pd.DataFrame: DataFrame containing the selected rows.
+    """
+    dataset = _dataset(store_path, from_table)
+
+    if not cols_to_select:
+        # Same column order as the SQL table, the partition columns come last in the dataset
+        cols_to_select = [col for col in tables_schemas[from_table] if col in dataset.schema.names]
+
+    table = dataset.to_table(columns=list(cols_to_select), filter=filters_expression(where_condition or []))
+    df = table.to_pandas()
+
+    # Files are visited in partition order (type before date), return the rows in the
+    # (date, type, Player) order of the SQL table primary key
+    sort_cols = [col for col in ['date', 'type', 'Player'] if col in df.columns]
+    if sort_cols:
+        df = df.sort_values(sort_cols, kind='stable', ignore_index=True)
+    return df
+
+
+def iter_select_from(store_path, from_table, cols_to_select=[], where_condition=None, chunk_size=10000, arrow=False):
+    """
+    Streaming variant of select_from, yielding the rows in chunks of at most chunk_size.
+
+    The row groups are read one after the other, so only the current batch is held in memory.
+    Unlike select_from the rows are not sorted: they come in storage order (partition, then date).
+
+    Args:
+    - store_path (str): Root folder of the Parquet store.
+    - from_table (str): Name of the table from which to select.
+    - cols_to_select (list, optional): List of column names to select. If empty, selects all columns.
+    - where_condition (list, optional): List of (column, operator, value) filters.
+    - chunk_size (int): Maximum number of rows per chunk. Default is 10000.
+    - arrow (bool): Yield pyarrow RecordBatches instead of DataFrames. Default is False.
+
+    Yields:
+    - pd.DataFrame or pa.RecordBatch: The next chunk of rows.
+    """
+    dataset = _dataset(store_path, from_table)
+    if not cols_to_select:
+        cols_to_select = [col for col in tables_schemas[from_table] if col in dataset.schema.names]
+
+    yield from iter_batches(dataset, cols_to_select, where_condition, chunk_size, arrow)
+
+
+def iter_batches(dataset, cols_to_select, where_condition, chunk_size, arrow):
+    """Yield the filtered, projected batches of a pyarrow dataset, skipping the empty ones."""
+    batches = dataset.to_batches(columns=list(cols_to_select) or None,
+                                 filter=filters_expression(where_condition or []),
+                                 batch_size=chunk_size)
+    for batch in batches:
+        if batch.num_rows:
+            yield batch if arrow else batch.to_pandas()
+
+
+def _normalize_dates(df):
+    df = df.copy()
+    df['date'] = pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d')
+    return df
+
+
+def write_stats(store_path, df):
+    """
+    Write stats rows in the Parquet store.
+
+    The sessions (category, type, date) present in df replace the ones already stored, the
+    other sessions of the same category and type folders are rewritten untouched.
+
+    Args:
+    - store_path (str): Root folder of the Parquet store.
+    - df (DataFrame): Rows with the stats_schema columns.
+
+    Returns:
+    None
+    """
+    df = _normalize_dates(df)
+    if 'category' not in df.columns:
+        df['category'] = None
+    df = df[[col for col in stats_schema if col in df.columns]]
+
+    if is_parquet_store(store_path):
+        # Keep the stored sessions of the folders being rewritten that are not in df
+        stored = select_from(store_path, 'stats', where_condition=[('type', 'IN', list(df['type'].unique()))])
+        stored = stored.merge(df[STATS_PARTITIONING].drop_duplicates(), on=STATS_PARTITIONING)
+        session_keys = STATS_PARTITIONING + ['date']
+        stored = stored.merge(df[session_keys].drop_duplicates(), on=session_keys, how='left', indicator=True)
+        stored = stored.loc[stored['_merge'] == 'left_only', df.columns]
+        df = pd.concat([stored, df], ignore_index=True)
+
+    df = df.sort_values(['date', 'type', 'Player'], kind='stable', ignore_index=True)
+    ds.write_dataset(
+        pa.Table.from_pandas(df, preserve_index=False),
+        _table_path(store_path, 'stats'),
+        format='parquet',
+        partitioning=_partitioning(),
+        basename_template='part-{i}.parquet',
+        existing_data_behavior='delete_matching',
+        min_rows_per_group=ROWS_PER_GROUP,
+        max_rows_per_group=ROWS_PER_GROUP,
+    )
+
+
+def write_file_available(store_path, df):
+    """
+    Write the file_available table in the Parquet store, replacing the stored one.
+
+    Args:
+    - store_path (str): Root folder of the Parquet store.
+    - df (DataFrame): Rows with the file_available_schema columns.
+
+    Returns:
+    None
+    """
+    os.makedirs(store_path, exist_ok=True)
+    df = _normalize_dates(df)
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), _table_path(store_path, 'file_available'))
+
+
+def migrate_sqlite(db_path, store_path):
+    """
+    Convert the stats and file_available tables of a SQLite database into a Parquet store.
+
+    Args:
+    - db_path (str): Path of the SQLite database.
+    - store_path (str): Root folder of the Parquet store to write.
+
+    Returns:
+    - int: Number of stats rows written.
+    """
+    from database_operations.engines import get_engine
+    from database_operations.sql_queries import select_from as sql_select_from
+
+    engine = get_engine(db_path)
+    write_file_available(store_path, sql_select_from(engine, 'file_available'))
+    stats = sql_select_from(engine, 'stats')
+    write_stats(store_path, stats)
+
+    return len(stats)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Convert a SQLite gps database into a partitioned Parquet store.')
+    parser.add_argument('db_path', help='Path of the SQLite database, e.g. data/gps_data.db')
+    parser.add_argument('store_path', help='Folder of the Parquet store to write, e.g. data/gps_data_parquet')
+    args = parser.parse_args()
+
+    n_rows = migrate_sqlite(args.db_path, args.store_path)
+    print(f'{n_rows} stats rows written to {osp.abspath(args.store_path)}')
@@ -0,0 +1,186 @@
+from functools import lru_cache
+
+from sqlalchemy import text
+
+
+FILTER_OPERATORS = ('=', '!=', '<', '<=', '>', '>=', 'IN')
+JOIN_TYPES = ('INNER', 'LEFT', 'RIGHT', 'FULL')
+
+
+def quote_identifier(name):
+    """Quote a table or column name, the stats columns contain spaces and symbols."""
+    return '`' + name.replace('`', '``') + '`'
+
+
+def filter_shape(filters):
+    """
+    Return the shape of a list of filters: which columns and operators are used and,
+    for IN filters, how many items they hold. Values are not part of the shape.
+
+    Args:
+    - filters (list): List of (column, operator, value) tuples.
+
+    Returns:
+    - tuple: Tuple of (column, operator, number of items or None).
+    """
+    shape = []
+    for column, operator, value in filters:
+        operator = operator.upper()
+        if operator not in FILTER_OPERATORS:
+            raise ValueError(f"Unsupported operator '{operator}', expected one of {FILTER_OPERATORS}")
+        shape.append((column, operator, len(value) if operator == 'IN' else None))
+    return tuple(shape)
+
+
+@lru_cache(maxsize=256)
+def compile_select(from_table, columns=(), shape=()):
+    """
+    Build the parameterized SELECT statement of a query shape.
+
+    The statement text only depends on the shape, so repeated queries with different values
+    reuse the same cached statement (and SQLite's prepared statement for that text).
+
+    Args:
+    - from_table (str): Name of the table from which to select.
+    - columns (tuple): Columns to select. If empty, selects all columns.
+    - shape (tuple): Shape of the filters, see filter_shape.
+
+    Returns:
+    - TextClause: Statement with the bound parameters :p0, :p1, ... (:p0_0, :p0_1, ... for IN).
+    """
+    select = ', '.join([quote_identifier(col) for col in columns]) if columns else '*'
+    query = f'SELECT {select} FROM {quote_identifier(from_table)}'
+
+    conditions = _conditions(shape, quote_identifier)
+    if conditions:
+        query += ' WHERE ' + ' AND '.join(conditions)
+
+    return text(query)
+
+
+def _conditions(shape, qualify):
+    """SQL conditions of a filter shape, qualify turns a filter column into a quoted column reference."""
+    conditions = []
+    for i, (column, operator, n_items) in enumerate(shape):
+        if operator == 'IN':
+            placeholders = ', '.join([f':p{i}_{j}' for j in range(n_items)])
+            conditions.append(f'{qualify(column)} IN ({placeholders})')
+        else:
+            conditions.append(f'{qualify(column)} {operator} :p{i}')
+    return conditions
+
+
+def _bind_params(filters):
+    """Parameters of a list of filters, named as in the statements of compile_select and compile_join."""
+    params = {}
+    for i, (_, operator, value) in enumerate(filters):
+        if operator.upper() == 'IN':
+            params.update({f'p{i}_{j}': v for j, v in enumerate(value)})
+        else:
+            params[f'p{i}'] = value
+    return params
+
+
+def build_select(from_table, columns=(), filters=()):
+    """
+    Build a SELECT statement and its parameters from a list of filters.
+
+    Args:
+    - from_table (str): Name of the table from which to select.
+    - columns (list, optional): Columns to select. If empty, selects all columns.
+    - filters (list, optional): List of (column, operator, value) tuples joined with AND.
+      Operators are the ones in FILTER_OPERATORS, IN expects a list of values.
+
+    Returns:
+    - tuple: (TextClause, dict of parameters).
+    """
+    filters = list(filters)
+    statement = compile_select(from_table, tuple(columns), filter_shape(filters))
+    return statement, _bind_params(filters)
+
+
+def qualified_column(table, column):
+    """Quoted `table`.`column` reference."""
+    return f'{quote_identifier(table)}.{quote_identifier(column)}'
+
+
+@lru_cache(maxsize=256)
+def compile_join(main_table, joins, columns, shape=()):
+    """
+    Build the parameterized SELECT ... JOIN statement of a join shape.
+
+    Selected columns are aliased c0, c1, ... in the order of columns, so that columns with the
+    same name in several tables never collide in the result.
+
+    Args:
+    - main_table (str): Table of the FROM clause.
+    - joins (tuple): Tuple of (table, join type, ((column, other table, other column), ...)).
+    - columns (tuple): Tuple of (table, column) to select.
+    - shape (tuple): Shape of the filters, see filter_shape, with (table, column) columns.
+
+    Returns:
+    - TextClause: Statement with the bound parameters :p0, :p1, ... (:p0_0, :p0_1, ... for IN).
+    """
+    select = ', '.join([f'{qualified_column(table, col)} AS c{i}' for i, (table, col) in enumerate(columns)])
+    query = f'SELECT {select} FROM {quote_identifier(main_table)}'
+
+    for table, join_type, on in joins:
+        if join_type not in JOIN_TYPES:
+            raise ValueError(f"Unsupported join type '{join_type}', expected one of {JOIN_TYPES}")
+        on_clause = ' AND '.join([
+            f'{qualified_column(table, col)} = {qualified_column(other_table, other_col)}'
+            for col, other_table, other_col in on
+        ])
+        query += f' {join_type} JOIN {quote_identifier(table)} ON {on_clause}'
+
+    conditions = _conditions(shape, lambda column: qualified_column(*column))
+    if conditions:
+        query += ' WHERE ' + ' AND '.join(conditions)
+
+    return text(query)
+
+
+def build_join(main_table, joins, columns, filters=()):
+    """
+    Build a SELECT ... JOIN statement and its parameters.
+
+    Args:
+    - main_table (str): Table of the FROM clause.
+    - joins (dict): Table to join -> {'type': join type, 'on': [(column, other table, other column), ...]}.
+    - columns (list): List of (table, column) to select.
+    - filters (list, optional): List of ((table, column), operator, value) tuples joined with AND.
+
+    Returns:
+    - tuple: (TextClause, dict of parameters).
+    """
+    joins = tuple(
+        (table, join.get('type', 'INNER').upper(), tuple(tuple(on) for on in join['on']))
+        for table, join in joins.items()
+    )
+    filters = list(filters)
+    statement = compile_join(main_table, joins, tuple(columns), filter_shape(filters))
+    return statement, _bind_params(filters)
+
+
+def stats_filters(dates=None, types=None, category=None):
+    """
+    Translate the filters of the reports into a list of filters on the stats table.
+
+    Args:
+    - dates (list, optional): [start] or [start, end] dates, both included.
+    - types (list, optional): Session types to keep.
+    - category (str, optional): Category to keep.
+
+    Returns:
+    - list: List of (column, operator, value) tuples.
+    """
+    filters = []
+    if dates:
+        filters.append(('date', '>=', str(dates[0])))
+        if len(dates) > 1:
+            filters.append(('date', '<=', str(dates[1])))
+    if types:
+        filters.append(('type', 'IN', list(types)))
+    if category:
+        filters.append(('category', '=', category))
+    return filters
@@ -0,0 +1,143 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+class RangeCache:
+    """
+    Cache of frames sorted by date that answers date ranges from the wider cached ones.
+
+    Each key (every filter but the dates, e.g. database, data version, types, category and
+    columns) holds disjoint segments, frames covering a [start, end] range of days. A range
+    inside a segment is a slice of its frame, found by binary search on the sorted dates.
+    A range overlapping or next to segments only fetches the days they miss, and the segments
+    are merged into one covering the whole range.
+
+    Dates are 'YYYY-MM-DD' strings, an end of None means no upper bound.
+
+    Args:
+    - fetch (callable): fetch(key, filters) returns the rows of the key matching the date
+      filters, a list of ('date', operator, value) tuples.
+    - date_column (str): Column of the dates. Default is 'date'.
+    - max_entries (int): Number of keys kept, the least recently used are dropped. Default is 64.
+    """
+
+    def __init__(self, fetch, date_column='date', max_entries=64):
+        self.fetch = fetch
+        self.date_column = date_column
+        self.max_entries = max_entries
+        self.stats = {'hits': 0, 'partial': 0, 'misses': 0}
+
+        self._entries = OrderedDict()
+        # The lock of a key keeps its loads from interleaving, while the sessions reading other
+        # keys go on; the cache lock only guards the bookkeeping, never a fetch
+        self._key_locks = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, start, end=None):
+        """
+        Return the rows of a key between two dates, both included.
+
+        Args:
+        - key (tuple): Hashable key of every filter but the dates.
+        - start (str): First date.
+        - end (str, optional): Last date. Defaults to no upper bound.
+
+        Returns:
+        - pd.DataFrame: The rows sorted by date, with a new RangeIndex.
+        """
+        start, end = str(start), None if end is None else str(end)
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                segments = self._entries.get(key, [])
+            touched = [segment for segment in segments if _touches(segment[0], segment[1], start, end)]
+            if not touched:
+                status = 'misses'
+                segment = self._segment(start, end, self._fetch_sorted(key, _range_filters(self.date_column, start, end)))
+            elif len(touched) == 1 and _covers(touched[0], start, end):
+                status = 'hits'
+                segment = touched[0]
+            else:
+                status = 'partial'
+                segment = self._fill(key, touched, start, end)
+
+            with self._lock:
+                self.stats[status] += 1
+                kept = [s for s in segments if not any(s is t for t in touched)]
+                self._entries[key] = sorted(kept + [segment], key=lambda s: s[0])
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    dropped, _ = self._entries.popitem(last=False)
+                    self._key_locks.pop(dropped, None)
+        return _slice(segment, start, end)
+
+    def clear(self):
+        """Drop every entry."""
+        with self._lock:
+            self._entries.clear()
+
+    def _fill(self, key, touched, start, end):
+        """Fetch the days between and around the touched segments and merge everything into one segment."""
+        column = self.date_column
+        parts = []
+        if start < touched[0][0]:
+            parts.append(self._fetch_sorted(key, [(column, '>=', start), (column, '<', touched[0][0])]))
+        for segment, following in zip(touched, touched[1:] + [None]):
+            parts.append(segment[2])
+            if following is not None:
+                parts.append(self._fetch_sorted(key, [(column, '>', segment[1]), (column, '<', following[0])]))
+        last_end = touched[-1][1]
+        if last_end is not None and (end is None or end > last_end):
+            parts.append(self._fetch_sorted(key, [(column, '>', last_end)] + ([(column, '<=', end)] if end is not None else [])))
+
+        merged_end = None if end is None or last_end is None else max(end, last_end)
+        return self._segment(min(start, touched[0][0]), merged_end, _concat(parts))
+
+    def _fetch_sorted(self, key, filters):
+        return self.fetch(key, filters).sort_values(self.date_column, kind='stable', ignore_index=True)
+
+    def _segment(self, start, end, df):
+        """(start, end, frame, dates): the dates are parsed once, a slice is then two binary searches."""
+        return (start, end, df, pd.to_datetime(df[self.date_column]).to_numpy())
+
+
+def _slice(segment, start, end):
+    _, _, df, dates = segment
+    first = np.searchsorted(dates, np.datetime64(start), side='left')
+    last = len(dates) if end is None else np.searchsorted(dates, np.datetime64(end), side='right')
+    return df.iloc[first:last].reset_index(drop=True)
+
+
+def _covers(segment, start, end):
+    segment_start, segment_end = segment[:2]
+    return segment_start <= start and (segment_end is None or (end is not None and end <= segment_end))
+
+
+def _touches(cached_start, cached_end, start, end):
+    """True if [start, end] overlaps the cached range or is next to it, so one segment can cover both."""
+    before_end = cached_end is None or start <= _next_day(cached_end)
+    after_start = end is None or _next_day(end) >= cached_start
+    return before_end and after_start
+
+
+def _next_day(date):
+    return str((pd.Timestamp(date) + pd.Timedelta(days=1)).date())
+
+
+def _range_filters(column, start, end):
+    return [(column, '>=', start)] + ([(column, '<=', end)] if end is not None else [])
+
+
+def _concat(parts):
+    """Concatenate date ordered parts, categorical columns stay categorical with the union of the categories."""
+    parts = [part for part in parts if len(part)] or parts[:1]
+    df = pd.concat(parts, ignore_index=True)
+    for col in parts[0].columns:
+        if any(isinstance(part[col].dtype, pd.CategoricalDtype) for part in parts):
+            df[col] = df[col].astype('category')
+    return df
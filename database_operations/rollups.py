@@ -0,0 +1,226 @@
+import argparse
+
+import pandas as pd
+from sqlalchemy import text
+
+from database_operations.query_builder import quote_identifier
+from database_operations.tables_indexes import table_columns
+from database_operations.tables_schema import stats_schema
+
+
+# SQL expression giving the first day of the period of a `date`, the Monday of its ISO week
+# ('weekday 0' moves to the next Sunday unless it already is one) or the first of its month
+ROLLUP_PERIODS = {
+    'week': "date(`date`, 'weekday 0', '-6 days')",
+    'month': "strftime('%Y-%m-01', `date`)",
+}
+
+ROLLUP_KEYS = ['Player', 'type', 'category']
+ROLLUP_AGGREGATES = ['sum', 'count', 'min', 'max']
+
+rollup_sources = {
+    'stats': stats_schema,
+}
+
+
+def rollup_table_name(source_table, period):
+    """Name of the rollup table of a source table, e.g. stats_rollup_week."""
+    return f'{source_table}_rollup_{period}'
+
+
+def rollup_column_name(column, aggregate):
+    """Name of the column holding an aggregate of a source column, e.g. 'Distanza__sum'."""
+    return f'{column}__{aggregate}'
+
+
+def period_start(dates, period):
+    """
+    Python counterpart of ROLLUP_PERIODS.
+
+    Args:
+    - dates (pd.Series): Dates as strings, dates or datetimes.
+    - period (str): 'week' or 'month'.
+
+    Returns:
+    - pd.Series: First day of the period of every date as a 'YYYY-MM-DD' string.
+    """
+    dates = pd.to_datetime(dates)
+    if period == 'week':
+        starts = dates - pd.to_timedelta(dates.dt.weekday, unit='D')
+    else:
+        starts = dates.dt.to_period('M').dt.start_time
+    return starts.dt.strftime('%Y-%m-%d')
+
+
+def _rollup_layout(connection, source_table):
+    """Return the group keys and numeric columns of the rollups, limited to the live source columns."""
+    existing_columns = table_columns(connection, source_table)
+    keys = [key for key in ROLLUP_KEYS if key in existing_columns]
+    numeric_columns = [
+        col for col, col_type in rollup_sources[source_table].items()
+        if col_type in ('REAL', 'INTEGER') and col in existing_columns
+    ]
+    return keys, numeric_columns
+
+
+def _aggregate_select(source_table, period, keys, numeric_columns):
+    aggregates = [
+        f'{aggregate.upper()}({quote_identifier(col)})'
+        for col in numeric_columns for aggregate in ROLLUP_AGGREGATES
+    ]
+    group_by = ', '.join([quote_identifier(key) for key in keys] + ['period_start'])
+    select = ', '.join(
+        [quote_identifier(key) for key in keys]
+        + [f'{ROLLUP_PERIODS[period]} AS period_start', 'COUNT(*) AS sessions']
+        + aggregates
+    )
+    return f'SELECT {select} FROM {quote_identifier(source_table)} AS s', group_by
+
+
+def create_rollup_tables(engine, source_table='stats', periods=None):
+    """
+    (Re)build the rollup tables of a source table from all its rows.
+
+    Args:
+    - engine: SQLAlchemy Engine object for database connection.
+    - source_table (str): Table to roll up. Default is 'stats'.
+    - periods (list, optional): Periods to build. Defaults to every ROLLUP_PERIODS key.
+
+    Returns:
+    - list: Names of the rollup tables.
+    """
+    with engine.begin() as connection:
+        return build_rollup_tables(connection, source_table, periods)
+
+
+def build_rollup_tables(connection, source_table='stats', periods=None):
+    """
+    (Re)build the rollup tables of a source table inside the caller's transaction, see create_rollup_tables.
+
+    Args:
+    - connection: SQLAlchemy Connection object, inside an open transaction.
+    - source_table (str): Table to roll up. Default is 'stats'.
+    - periods (list, optional): Periods to build. Defaults to every ROLLUP_PERIODS key.
+
+    Returns:
+    - list: Names of the rollup tables.
+    """
+    tables = []
+    keys, numeric_columns = _rollup_layout(connection, source_table)
+    for period in periods or ROLLUP_PERIODS:
+        table_name = rollup_table_name(source_table, period)
+        columns = [f'{quote_identifier(key)} TEXT' for key in keys]
+        columns += ['period_start TEXT', 'sessions INTEGER']
+        columns += [
+            f'{quote_identifier(rollup_column_name(col, aggregate))} REAL'
+            for col in numeric_columns for aggregate in ROLLUP_AGGREGATES
+        ]
+        primary_keys = ', '.join([quote_identifier(key) for key in keys] + ['period_start'])
+
+        connection.execute(text(f'DROP TABLE IF EXISTS {quote_identifier(table_name)}'))
+        connection.execute(text(
+            f'CREATE TABLE {quote_identifier(table_name)} ({", ".join(columns)}, PRIMARY KEY ({primary_keys}))'
+        ))
+        select, group_by = _aggregate_select(source_table, period, keys, numeric_columns)
+        connection.execute(text(f'INSERT INTO {quote_identifier(table_name)} {select} GROUP BY {group_by}'))
+        tables.append(table_name)
+
+    return tables
+
+
+def refresh_rollups(connection, source_table, df):
+    """
+    Recompute the rollup rows of the groups touched by the rows of df, in the caller's transaction.
+
+    Every (keys, period) group containing one of the written rows is deleted and aggregated again
+    from the source table, which stays correct when rows are updated rather than appended. Nothing
+    is done if the source table has no rollup tables.
+
+    Args:
+    - connection: SQLAlchemy Connection object, inside the transaction that wrote df.
+    - source_table (str): Table the rows were written to.
+    - df (DataFrame): The written rows, they must contain the group keys and the date.
+
+    Returns:
+    None
+    """
+    if source_table not in rollup_sources or 'date' not in df.columns or df.empty:
+        return
+
+    existing_tables = {
+        row[0] for row in connection.execute(text("SELECT name FROM sqlite_master WHERE type='table'")).fetchall()
+    }
+    periods = [period for period in ROLLUP_PERIODS if rollup_table_name(source_table, period) in existing_tables]
+    if not periods:
+        return
+
+    keys, numeric_columns = _rollup_layout(connection, source_table)
+
+    def on_keys(alias):
+        # IS is the NULL-safe equality, rows without a category still match their group
+        return ' AND '.join([f'k.{quote_identifier(key)} IS {alias}.{quote_identifier(key)}' for key in keys])
+
+    for period in periods:
+        groups = df[keys].copy()
+        groups['period_start'] = period_start(df['date'], period).values
+        groups = groups.drop_duplicates()
+        # Periods are at most a month long, this bounds the source rows read through the date index
+        first_day = groups['period_start'].min()
+        last_day = (pd.to_datetime(groups['period_start'].max()) + pd.DateOffset(months=1)).strftime('%Y-%m-%d')
+
+        connection.exec_driver_sql('DROP TABLE IF EXISTS temp._rollup_groups')
+        connection.exec_driver_sql(
+            f'CREATE TEMP TABLE _rollup_groups ({", ".join([quote_identifier(key) for key in keys])}, period_start)'
+        )
+        connection.exec_driver_sql(
+            f'INSERT INTO temp._rollup_groups VALUES ({", ".join(["?"] * (len(keys) + 1))})',
+            list(groups.astype(object).where(groups.notna(), None).itertuples(index=False, name=None)),
+        )
+
+        table_name = quote_identifier(rollup_table_name(source_table, period))
+        connection.exec_driver_sql(
+            f'DELETE FROM {table_name} AS t WHERE EXISTS ('
+            f'SELECT 1 FROM temp._rollup_groups AS k WHERE {on_keys("t")} AND k.period_start = t.period_start)'
+        )
+
+        select, group_by = _aggregate_select(source_table, period, keys, numeric_columns)
+        connection.exec_driver_sql(
+            f'INSERT INTO {table_name} {select} '
+            f'WHERE s.`date` >= ? AND s.`date` < ? AND EXISTS ('
+            f'SELECT 1 FROM temp._rollup_groups AS k WHERE {on_keys("s")} AND k.period_start = {ROLLUP_PERIODS[period]}) '
+            f'GROUP BY {group_by}',
+            (first_day, last_day),
+        )
+        connection.exec_driver_sql('DROP TABLE temp._rollup_groups')
+
+
+def rollup_averages(rollup, columns, aggregate='mean'):
+    """
+    Turn a rollup frame into one value per metric and period.
+
+    Args:
+    - rollup (DataFrame): Rows of a rollup table.
+    - columns (list): Source columns to compute.
+    - aggregate (str): 'mean' (average per session), 'sum', 'min' or 'max'. Default is 'mean'.
+
+    Returns:
+    - pd.DataFrame: The group keys, 'date' (first day of the period), 'sessions' and one column per metric.
+    """
+    df = rollup[[col for col in ROLLUP_KEYS + ['sessions'] if col in rollup.columns]].copy()
+    df['date'] = rollup['period_start']
+    for col in columns:
+        if aggregate == 'mean':
+            df[col] = rollup[rollup_column_name(col, 'sum')] / rollup[rollup_column_name(col, 'count')]
+        else:
+            df[col] = rollup[rollup_column_name(col, aggregate)]
+    return df
+
+
+if __name__ == '__main__':
+    from database_operations.engines import get_engine
+
+    parser = argparse.ArgumentParser(description='Build the weekly and monthly rollup tables of the stats table.')
+    parser.add_argument('db_path', help='Path of the SQLite database')
+    args = parser.parse_args()
+
+    print('Rollup tables:', create_rollup_tables(get_engine(args.db_path, role='write'), 'stats'))
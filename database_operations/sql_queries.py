@@ -1,17 +1,27 @@
 import os
+import os.path as osp
+import threading
+from datetime import date
+
 import pandas as pd
 
 import numpy as np
+import pyarrow as pa
 from sqlalchemy import text, MetaData, Table, inspect, create_engine
 from sqlalchemy import update, and_
 from sqlalchemy.dialects.sqlite import insert
 from tqdm import tqdm
 
+from database_operations.engines import apply_profile
+from database_operations.query_builder import build_join, build_select
+from database_operations.rollups import refresh_rollups
+from database_operations.tables_schema import tables_schemas
+
 
 def create_database(db_path):
     try:
         print(f'Creazione db at {os.path.abspath(db_path)}')
-        engine = create_engine(f'sqlite:///{db_path}', echo=True)
+        engine = apply_profile(create_engine(f'sqlite:///{db_path}', echo=True), 'ingest')
         # Test the engine by connecting to it
         with engine.connect() as connection:
             print("Successfully connected to the database.")
@@ -33,17 +43,76 @@ def table_exists(engine, table_name):
     - bool: True if the table exists, False otherwise.
     """
     exists = False
-    try:
-        with engine.connect() as con:
-            query = text(f"SELECT name FROM sqlite_master WHERE type='table' AND name='{table_name}'")
-            result = con.execute(query)
-            exists = bool(result.fetchone())
-    finally:
-        engine.dispose()
+    with engine.connect() as con:
+        query = text(f"SELECT name FROM sqlite_master WHERE type='table' AND name='{table_name}'")
+        result = con.execute(query)
+        exists = bool(result.fetchone())
     return exists
 
 
 
+# Reflected tables per (database path, table name), see reflect_table
+_reflected_tables = {}
+_reflected_tables_lock = threading.Lock()
+
+
+def _database_key(bind):
+    """Absolute path of the database of an Engine or Connection, the same for its read and write engines."""
+    database = bind.engine.url.database or ''
+    if database.startswith('file:'):
+        # Read-only URI form, see engines.sqlite_url
+        database = database[len('file:'):].split('?')[0]
+    return osp.abspath(database)
+
+
+def reflect_table(bind, table_name):
+    """
+    Return the reflected Table of table_name, running the reflection queries only the first time.
+
+    The cache lives as long as the process and is shared by every engine of the same database.
+    Schema changes made through create_table, add_empty_column, delete_column or the migrations
+    invalidate it, changes made by other processes need invalidate_reflection.
+
+    Args:
+    - bind: SQLAlchemy Engine or Connection object. Inside a transaction pass its Connection.
+    - table_name (str): Name of the table.
+
+    Returns:
+    - Table: The reflected table.
+    """
+    key = (_database_key(bind), table_name)
+    with _reflected_tables_lock:
+        table = _reflected_tables.get(key)
+    if table is None:
+        table = Table(table_name, MetaData(), autoload_with=bind)
+        with _reflected_tables_lock:
+            _reflected_tables[key] = table
+    return table
+
+
+def primary_key_columns(bind, table_name):
+    """Return the primary keys of a table, from the reflection cache."""
+    return [key.name for key in inspect(reflect_table(bind, table_name)).primary_key]
+
+
+def invalidate_reflection(bind, table_name=None):
+    """
+    Drop the cached reflection of a table, or of every table of the database if table_name is None.
+
+    Args:
+    - bind: SQLAlchemy Engine or Connection object of the database.
+    - table_name (str, optional): Name of the table.
+
+    Returns:
+    None
+    """
+    database = _database_key(bind)
+    with _reflected_tables_lock:
+        for key in list(_reflected_tables):
+            if key[0] == database and (table_name is None or key[1] == table_name):
+                del _reflected_tables[key]
+
+
 def create_table(engine, table_name, column_types, primary_keys=None):
     """
     Create a table in the database using the provided column types.
@@ -57,23 +126,21 @@ def create_table(engine, table_name, column_types, primary_keys=None):
     Returns:
     - None
     """
-    try:
-        # Construct the schema part with columns and data types
-        schema = ', '.join([f'`{col}` {col_type}' for col, col_type in column_types.items()])
+    # Construct the schema part with columns and data types
+    schema = ', '.join([f'`{col}` {col_type}' for col, col_type in column_types.items()])
 
-        # Add primary keys if specified
-        if primary_keys:
-            primary_keys_str = ', '.join([f'`{key}`' for key in primary_keys])
-            schema += f', PRIMARY KEY ({primary_keys_str})'
+    # Add primary keys if specified
+    if primary_keys:
+        primary_keys_str = ', '.join([f'`{key}`' for key in primary_keys])
+        schema += f', PRIMARY KEY ({primary_keys_str})'
 
-        # Create the query to create the table
-        create_query = text(f'CREATE TABLE IF NOT EXISTS `{table_name}` ({schema})')
+    # Create the query to create the table
+    create_query = text(f'CREATE TABLE IF NOT EXISTS `{table_name}` ({schema})')
 
-        # Execute the query to create the table
-        with engine.connect() as con:
-            con.execute(create_query)
-    finally:
-        engine.dispose()
+    # Execute the query to create the table
+    with engine.connect() as con:
+        con.execute(create_query)
+    invalidate_reflection(engine, table_name)
 
 
         
@@ -98,10 +165,8 @@ def insert_table(engine, table_name, df, chunk_size=1000, disable_pb = False):
     None
     """
     try:
-        # Reflect the existing table from the database
-        metadata = MetaData()
-        table = Table(table_name, metadata, autoload_with=engine)
-        primary_keys = [key.name for key in inspect(table).primary_key]
+        # Reflected once per process, see reflect_table
+        table = reflect_table(engine, table_name)
 
         # Calculate total number of chunks
         total_chunks = -(-len(df) // chunk_size)  # Ceiling division
@@ -112,15 +177,15 @@ def insert_table(engine, table_name, df, chunk_size=1000, disable_pb = False):
             for i, chunk in enumerate(tqdm(chunks(df, chunk_size), total=total_chunks, desc="Inserting records", disable=disable_pb)):
                 records = chunk.to_dict(orient='records')
                 connection.execute(table.insert().values(records))
+
+            # Keep the rollup tables of the table, if any, in sync within the same transaction
+            refresh_rollups(connection, table_name, df)
         
         
 
     except Exception as e:
         print(f"Error occurred: {str(e)}")
         return False  # Raise the exception to indicate failure
-    finally:
-        # Close the connection to the database engine
-        engine.dispose()
 
     return True
         
@@ -133,120 +198,326 @@ def select_from(engine, from_table, cols_to_select=[], where_condition=None):
     - engine: SQLAlchemy Engine object for database connection.
     - from_table (str): Name of the table from which to select.
     - cols_to_select (list, optional): List of column names to select. If empty, selects all columns.
-    - where_condition (str, optional): WHERE condition for filtering rows in the query.
+    - where_condition (str or list, optional): WHERE condition for filtering rows in the query. Either a
+      raw SQL string or a list of (column, operator, value) filters bound as parameters, see
+      query_builder.build_select.
 
     Returns:
     - pd.DataFrame: DataFrame containing the results of the SELECT query.
     """
-    select = "SELECT "
+    statement, params = _select_statement(from_table, cols_to_select, where_condition)
+    return pd.read_sql_query(statement, con=engine, params=params)
 
-    if len(cols_to_select) == 0:
-        select += '*'
-    else:
-        for i, col in enumerate(cols_to_select):
-            if i == len(cols_to_select) - 1:
-                select += f'{col} '
-            else:
-                select += f'{col}, '
 
-    try:
-        query = f"""{select} FROM {from_table} """
-        if where_condition:
-            query += f"WHERE {where_condition}"
+def iter_select_from(engine, from_table, cols_to_select=[], where_condition=None, chunk_size=10000, arrow=False):
+    """
+    Streaming variant of select_from, yielding the rows in chunks of at most chunk_size.
+
+    Rows are fetched from the cursor as the chunks are consumed, so only one chunk is held in
+    memory at a time. The connection stays checked out until the generator is exhausted or closed.
+
+    Args:
+    - engine: SQLAlchemy Engine object for database connection.
+    - from_table (str): Name of the table from which to select.
+    - cols_to_select (list, optional): List of column names to select. If empty, selects all columns.
+    - where_condition (str or list, optional): WHERE condition, see select_from.
+    - chunk_size (int): Maximum number of rows per chunk. Default is 10000.
+    - arrow (bool): Yield pyarrow RecordBatches instead of DataFrames. Default is False.
+
+    Yields:
+    - pd.DataFrame or pa.RecordBatch: The next chunk of rows.
+    """
+    statement, params = _select_statement(from_table, cols_to_select, where_condition)
+    with engine.connect().execution_options(stream_results=True, max_row_buffer=chunk_size) as connection:
+        for chunk in pd.read_sql_query(statement, con=connection, params=params, chunksize=chunk_size):
+            yield pa.RecordBatch.from_pandas(chunk, preserve_index=False) if arrow else chunk
+
+
+def _select_statement(from_table, cols_to_select, where_condition):
+    """Return the (statement, params) of select_from and iter_select_from."""
+    if isinstance(where_condition, str):
+        statement, params = build_select(from_table, cols_to_select)
+        # Raw SQL condition, sent as is to the driver
+        return f"{statement.text} WHERE {where_condition}", params
+    return build_select(from_table, cols_to_select, where_condition or [])
+
+
+
+def _to_db_records(df):
+    """
+    Convert a DataFrame into a list of tuples ready to be bound to a DBAPI executemany.
+
+    Missing values become None and date-like values become ISO formatted strings, the
+    same representation SQLAlchemy uses for the `Date` columns of the schemas.
+
+    Args:
+    - df (DataFrame): DataFrame to convert.
+
+    Returns:
+    - list: One tuple per row, following the order of df.columns.
+    """
+    df = df.copy()
+    for col in df.columns:
+        if pd.api.types.is_datetime64_any_dtype(df[col]):
+            df[col] = df[col].dt.strftime('%Y-%m-%d')
+    df = df.astype(object).where(df.notna(), None)
+
+    return [
+        tuple(v.strftime('%Y-%m-%d') if isinstance(v, date) else v for v in row)
+        for row in df.itertuples(index=False, name=None)
+    ]
+
+
+def _create_staging_table(connection, table_name, columns, index_columns=None):
+    """
+    Create (or recreate) an empty temporary table with the given columns of table_name.
+
+    Args:
+    - connection: SQLAlchemy Connection object, the staging table lives as long as it.
+    - table_name (str): Name of the table the staging table is modelled on.
+    - columns (list): Columns of table_name to copy in the staging table.
+    - index_columns (list, optional): Columns on which to build an index, usually the primary keys.
+
+    Returns:
+    - str: Name of the staging table.
+    """
+    staging_name = f'_staging_{table_name}'
+    cols = ', '.join([f'`{col}`' for col in columns])
+
+    connection.exec_driver_sql(f'DROP TABLE IF EXISTS temp.`{staging_name}`')
+    connection.exec_driver_sql(
+        f'CREATE TEMP TABLE `{staging_name}` AS SELECT {cols} FROM `{table_name}` WHERE 0'
+    )
+    if index_columns:
+        index_cols = ', '.join([f'`{col}`' for col in index_columns])
+        connection.exec_driver_sql(
+            f'CREATE INDEX temp.`ix{staging_name}` ON `{staging_name}` ({index_cols})'
+        )
+
+    return staging_name
+
+
+def _load_staging_table(connection, staging_name, df, chunk_size=1000, disable_pb=False):
+    """
+    Load the DataFrame into the staging table with one executemany per chunk of rows.
+
+    Args:
+    - connection: SQLAlchemy Connection object that owns the staging table.
+    - staging_name (str): Name of the staging table.
+    - df (DataFrame): DataFrame whose columns match the staging table ones.
+    - chunk_size (int): Number of rows bound per executemany call. Default is 1000.
+    - disable_pb (bool): Disable the progress bar. Default is False.
 
-        return pd.read_sql_query(query, con=engine)
-    finally:
-        engine.dispose()
+    Returns:
+    None
+    """
+    cols = ', '.join([f'`{col}`' for col in df.columns])
+    placeholders = ', '.join(['?'] * len(df.columns))
+    insert_query = f'INSERT INTO temp.`{staging_name}` ({cols}) VALUES ({placeholders})'
 
+    records = _to_db_records(df)
+    total_chunks = -(-len(records) // chunk_size)  # Ceiling division
+    for chunk in tqdm(chunks(records, chunk_size), total=total_chunks, desc="Staging records", disable=disable_pb):
+        connection.exec_driver_sql(insert_query, chunk)
 
 
-def upsert_table(engine, table_name, df):
+def upsert_table(engine, table_name, df, bulk=True, chunk_size=1000, disable_pb=False):
     """
     Update or insert records from the DataFrame into the specified table in the database.
 
+    In bulk mode the DataFrame is loaded in a temporary staging table and merged into the
+    target table with a single INSERT ... SELECT ... ON CONFLICT statement, everything in one
+    transaction. With bulk=False every row is upserted with its own statement and commit, as
+    upsert_table did before the bulk mode (and returns None, as it did).
+
+    Rows of the DataFrame sharing a primary key are merged as one, the last one wins.
+
     Args:
     - engine: SQLAlchemy Engine object for database connection.
     - table_name (str): Name of the table in the database.
     - df (DataFrame): DataFrame containing the data to be inserted or updated.
+    - bulk (bool): Use the set-based upsert. Default is True.
+    - chunk_size (int): Number of rows loaded per executemany call in bulk mode. Default is 1000.
+    - disable_pb (bool): Disable the progress bar. Default is False.
 
     Returns:
-    - None
+    - dict: Number of rows 'inserted' and 'updated' in bulk mode, None otherwise.
     """
-    try:
-        # Reflect the existing table from the database
-        metadata = MetaData()
-        table = Table(table_name, metadata, autoload_with=engine)
-        primary_keys = [key.name for key in inspect(table).primary_key]
+    # Reflected once per process, see reflect_table
+    table = reflect_table(engine, table_name)
+    primary_keys = primary_key_columns(engine, table_name)
+
+    if bulk:
+        return _bulk_upsert(engine, table_name, df, primary_keys, chunk_size, disable_pb)
+
+    # Iterate over each row in the DataFrame
+    for _, record in tqdm(df.iterrows(), total=len(df), disable=disable_pb):
+        # Build the insert statement
+        insert_stmt = insert(table).values(record.to_dict())
+
+        # Create a dictionary for columns to update in case of conflict
+        update_dict = {
+            c.name: c
+            for c in insert_stmt.excluded
+            if not c.primary_key
+        }
+
+        # Build the upsert statement
+        do_update_stmt = insert_stmt.on_conflict_do_update(
+            index_elements=primary_keys,
+            set_=update_dict,
+        )
+
+        # Execute the database connection and upsert the record
+        with engine.connect() as connection:
+            connection.execute(do_update_stmt)
+            connection.commit()  # Commit the transaction
+
+    with engine.begin() as connection:
+        refresh_rollups(connection, table_name, df)
+
+
+def _bulk_upsert(engine, table_name, df, primary_keys, chunk_size=1000, disable_pb=False):
+    """
+    Set-based upsert used by upsert_table, see its docstring for the arguments.
+
+    Returns:
+    - dict: Number of rows 'inserted' and 'updated'.
+    """
+    with engine.begin() as connection:
+        return upsert_rows(connection, table_name, df, primary_keys, chunk_size, disable_pb)
+
+
+def upsert_rows(connection, table_name, df, primary_keys, chunk_size=1000, disable_pb=False):
+    """
+    Merge the DataFrame into the table inside the caller's transaction.
+
+    This is the statement sequence of the bulk upsert_table, for callers that need to write
+    several tables atomically.
 
-        # Iterate over each row in the DataFrame
-        for _, record in tqdm(df.iterrows(), total=len(df)):
-            # Build the insert statement
-            insert_stmt = insert(table).values(record.to_dict())
+    Args:
+    - connection: SQLAlchemy Connection object, inside an open transaction.
+    - table_name (str): Name of the table in the database.
+    - df (DataFrame): DataFrame containing the data to be inserted or updated.
+    - primary_keys (list): Primary keys of the table.
+    - chunk_size (int): Number of rows loaded per executemany call. Default is 1000.
+    - disable_pb (bool): Disable the progress bar. Default is False.
+
+    Returns:
+    - dict: Number of distinct keys 'inserted' and 'updated'.
+    """
+    # The last row of a key wins, like successive upserts, and every key is counted once
+    df = df.drop_duplicates(subset=primary_keys, keep='last')
+    columns = list(df.columns)
+    cols = ', '.join([f'`{col}`' for col in columns])
+    on_pk = ' AND '.join([f't.`{key}` = s.`{key}`' for key in primary_keys])
+    conflict_cols = ', '.join([f'`{key}`' for key in primary_keys])
+    update_cols = [col for col in columns if col not in primary_keys]
+
+    if update_cols:
+        set_clause = ', '.join([f'`{col}` = excluded.`{col}`' for col in update_cols])
+        on_conflict = f'ON CONFLICT ({conflict_cols}) DO UPDATE SET {set_clause}'
+    else:
+        on_conflict = f'ON CONFLICT ({conflict_cols}) DO NOTHING'
 
-            # Create a dictionary for columns to update in case of conflict
-            update_dict = {
-                c.name: c
-                for c in insert_stmt.excluded
-                if not c.primary_key
-            }
+    staging_name = _create_staging_table(connection, table_name, columns, index_columns=primary_keys)
+    _load_staging_table(connection, staging_name, df, chunk_size, disable_pb)
 
-            # Build the upsert statement
-            do_update_stmt = insert_stmt.on_conflict_do_update(
-                index_elements=primary_keys,
-                set_=update_dict,
-            )
+    # Rows whose key is already in the table are the ones that will be updated
+    updated = connection.exec_driver_sql(
+        f'SELECT COUNT(*) FROM temp.`{staging_name}` s JOIN `{table_name}` t ON {on_pk}'
+    ).scalar()
 
-            # Execute the database connection and upsert the record
-            with engine.connect() as connection:
-                connection.execute(do_update_stmt)
-                connection.commit()  # Commit the transaction
-    finally:
-        # Close the connection to the database engine
-        engine.dispose()
+    # WHERE true avoids the parsing ambiguity between ON CONFLICT and a join constraint
+    connection.exec_driver_sql(
+        f'INSERT INTO `{table_name}` ({cols}) '
+        f'SELECT {cols} FROM temp.`{staging_name}` WHERE true '
+        f'{on_conflict}'
+    )
+    connection.exec_driver_sql(f'DROP TABLE temp.`{staging_name}`')
+    refresh_rollups(connection, table_name, df)
 
+    return {'inserted': len(df) - updated, 'updated': updated}
 
 
 
-def update_table(engine, table_name, df, cols=[]):
+
+def update_table(engine, table_name, df, cols=[], bulk=True, chunk_size=1000, disable_pb=False):
     """
     Update records in the specified database table with data provided in the DataFrame.
 
+    In bulk mode the primary keys and the columns to update are loaded in a temporary staging
+    table and applied with a single UPDATE ... FROM statement in one transaction. With
+    bulk=False every row is updated with its own statement and commit.
+
     Args:
     - engine: SQLAlchemy Engine object for database connection.
     - table_name (str): Name of the table in the database.
     - df (DataFrame): DataFrame containing the data to update.
     - cols (list, optional): List of columns to update. If not specified, updates the entire row.
+    - bulk (bool): Use the set-based update. Default is True.
+    - chunk_size (int): Number of rows loaded per executemany call in bulk mode. Default is 1000.
+    - disable_pb (bool): Disable the progress bar. Default is False.
 
     Returns:
-    - None
+    - int: Number of rows updated in bulk mode, None otherwise.
     """
-    try:
-        # Reflect the existing table from the database
-        metadata = MetaData()
-        table = Table(table_name, metadata, autoload_with=engine)
-        primary_keys = [key.name for key in inspect(table).primary_key]
-
-        # Iterate over each row in the DataFrame
-        for _, record in tqdm(df.iterrows(), total=len(df)):
-            # If cols is not specified, update the entire row; otherwise, update only the specified columns
-            if not cols:
-                update_values = record.to_dict()  # Update the entire row
-            else:
-                update_values = {col: record[col] for col in cols}  # Update only specified columns
+    # Reflected once per process, see reflect_table
+    table = reflect_table(engine, table_name)
+    primary_keys = primary_key_columns(engine, table_name)
+
+    if bulk:
+        return _bulk_update(engine, table_name, df, primary_keys, cols, chunk_size, disable_pb)
+
+    # Iterate over each row in the DataFrame
+    for _, record in tqdm(df.iterrows(), total=len(df), disable=disable_pb):
+        # If cols is not specified, update the entire row; otherwise, update only the specified columns
+        if not cols:
+            update_values = record.to_dict()  # Update the entire row
+        else:
+            update_values = {col: record[col] for col in cols}  # Update only specified columns
                 
-            # Create the WHERE clause to locate the record to update
-            where_clause = and_(*[getattr(table.c, key) == record[key] for key in primary_keys])
+        # Create the WHERE clause to locate the record to update
+        where_clause = and_(*[getattr(table.c, key) == record[key] for key in primary_keys])
+
+        # Build the update statement
+        update_stmt = update(table).values(update_values).where(where_clause)
+
+        # Execute the database connection and update the record
+        with engine.connect() as connection:
+            connection.execute(update_stmt)
+            connection.commit()  # Commit the transaction
+
+    with engine.begin() as connection:
+        refresh_rollups(connection, table_name, df)
 
-            # Build the update statement
-            update_stmt = update(table).values(update_values).where(where_clause)
 
-            # Execute the database connection and update the record
-            with engine.connect() as connection:
-                connection.execute(update_stmt)
-                connection.commit()  # Commit the transaction
-    finally:
-        # Close the connection to the database engine
-        engine.dispose()
+def _bulk_update(engine, table_name, df, primary_keys, cols=[], chunk_size=1000, disable_pb=False):
+    """
+    Set-based update used by update_table, see its docstring for the arguments.
+
+    Returns:
+    - int: Number of rows updated.
+    """
+    update_cols = list(cols) if cols else [col for col in df.columns if col not in primary_keys]
+    staging_df = df[primary_keys + [col for col in update_cols if col not in primary_keys]]
+
+    set_clause = ', '.join([f'`{col}` = s.`{col}`' for col in update_cols])
+    on_pk = ' AND '.join([f'`{table_name}`.`{key}` = s.`{key}`' for key in primary_keys])
+
+    with engine.begin() as connection:
+        staging_name = _create_staging_table(connection, table_name, list(staging_df.columns), index_columns=primary_keys)
+        _load_staging_table(connection, staging_name, staging_df, chunk_size, disable_pb)
+
+        result = connection.exec_driver_sql(
+            f'UPDATE `{table_name}` SET {set_clause} '
+            f'FROM temp.`{staging_name}` AS s WHERE {on_pk}'
+        )
+        updated = result.rowcount
+        connection.exec_driver_sql(f'DROP TABLE temp.`{staging_name}`')
+        refresh_rollups(connection, table_name, df)
+
+    return updated
 
 
 def add_empty_column(engine, table_name, column_name, column_type):
@@ -263,24 +534,21 @@ def add_empty_column(engine, table_name, column_name, column_type):
     - bool: True if the column was created, False otherwise.
     """
     col_created = False
-    try:
-        # Create a connection to the database
-        with engine.connect() as connection:
-            # Check if the column already exists in the table
-            query = text(f"PRAGMA table_info({table_name})")
-            result = connection.execute(query)
-            existing_columns = [row[1] for row in result.fetchall()]
-
-            # If the column doesn't exist, execute the ALTER TABLE statement to add it
-            if column_name not in existing_columns:
-                alter_query = text(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {column_type}")
-                connection.execute(alter_query)
-                col_created = True
-            else:
-                print(f"Column '{column_name}' already exists in table '{table_name}'")
-    finally:
-        # Dispose of the connection to the database engine
-        engine.dispose()
+    # Create a connection to the database
+    with engine.connect() as connection:
+        # Check if the column already exists in the table
+        query = text(f"PRAGMA table_info({table_name})")
+        result = connection.execute(query)
+        existing_columns = [row[1] for row in result.fetchall()]
+
+        # If the column doesn't exist, execute the ALTER TABLE statement to add it
+        if column_name not in existing_columns:
+            alter_query = text(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {column_type}")
+            connection.execute(alter_query)
+            col_created = True
+            invalidate_reflection(engine, table_name)
+        else:
+            print(f"Column '{column_name}' already exists in table '{table_name}'")
 
     return col_created
 
@@ -298,91 +566,88 @@ def delete_column(engine, table_name, column_name):
     Returns:
     None
     """
-    try:
-        # Create a connection to the database
-        with engine.connect() as connection:
-            # Check if the column exists in the table
-            query = text(f"PRAGMA table_info({table_name})")
-            result = connection.execute(query)
-            existing_columns = [row[1] for row in result.fetchall()]
+    # Create a connection to the database
+    with engine.connect() as connection:
+        # Check if the column exists in the table
+        query = text(f"PRAGMA table_info({table_name})")
+        result = connection.execute(query)
+        existing_columns = [row[1] for row in result.fetchall()]
 
-            # If the column exists, execute the ALTER TABLE statement to drop it
-            if column_name in existing_columns:
-                alter_query = text(f"ALTER TABLE {table_name} DROP COLUMN {column_name}")
-                connection.execute(alter_query)
-            else:
-                print(f"Column '{column_name}' does not exist in table '{table_name}'")
-    finally:
-        # Dispose of the database connection
-        engine.dispose()
+        # If the column exists, execute the ALTER TABLE statement to drop it
+        if column_name in existing_columns:
+            alter_query = text(f"ALTER TABLE {table_name} DROP COLUMN {column_name}")
+            connection.execute(alter_query)
+            invalidate_reflection(engine, table_name)
+        else:
+            print(f"Column '{column_name}' does not exist in table '{table_name}'")
 
 
 
 
 
-def make_join(engine, main_table, joins):
+def _join_columns(connection, table_name):
+    """Columns of a table in the order of its known schema, limited to the ones of the live table."""
+    existing_columns = list(reflect_table(connection, table_name).columns.keys())
+    if table_name in tables_schemas:
+        return [col for col in tables_schemas[table_name] if col in existing_columns]
+    return existing_columns
+
+
+def select_join(engine, main_table, joins, columns=None, where_condition=None, column_format='multiindex'):
     """
-    Executes a join operation between the main table and specified tables.
+    Join tables with a single parameterized statement, reading only the selected columns.
 
     Args:
     - engine: SQLAlchemy Engine object for database connection.
     - main_table (str): Name of the main table.
-    - joins (dict): Dictionary specifying the tables to join. Each key is the table name to join, and the value is a dictionary with:
-        - 'type' (str): Type of join to execute ('INNER', 'LEFT', 'RIGHT', 'FULL').
-        - 'on' (list): List of tuples specifying the columns to join on. Each tuple contains three elements: (column in the joining table, joining table, column in the main table).
+    - joins (dict): Tables to join, in order. Each key is a table name and each value a dictionary with:
+        - 'type' (str): Type of join ('INNER', 'LEFT', 'RIGHT', 'FULL'). Default is 'INNER'.
+        - 'on' (list): List of (column in the joined table, other table, column in the other table) tuples.
+    - columns (dict, optional): Table name -> list of columns to select. Tables left out contribute all
+      their columns, in the order of their schema in tables_schemas; an empty list selects none.
+    - where_condition (list, optional): List of (column, operator, value) filters, see build_select.
+      Columns are (table, column) tuples, plain names refer to the main table.
+    - column_format (str): 'multiindex' for (table, column) columns, 'prefix' for 'table.column' names.
+      Default is 'multiindex'.
 
     Returns:
-    DataFrame: Resulting DataFrame from the join operation. Columns have a MultiIndex (table_name, column_name).
+    - pd.DataFrame: DataFrame with the selected columns of every table.
     """
-    select = f"{main_table}.* "
-    join = ''
-    
-    # Build the SELECT and JOIN strings based on the specifications
-    for table, v in joins.items():
-        select += f", {table}.*"
-        join += f"{v['type']} JOIN {table} ON "
-        for i, (left_on, right_table, right_on) in enumerate(v['on']):
-            join += f"{table}.{left_on} = {right_table}.{right_on} "
-            if i + 1 < len(v['on']):
-                join += 'AND '
-
-    # Construct the complete SQL query
-    query = f"""
-    SELECT {select}
-    FROM {main_table}
-    {join}
-    """
-
-    try:
-        # Read data from the SQL query
-        df = pd.read_sql_query(query, con=engine)
-        
-        # Find the position of the artificial column separator ':'
-        fake_col_index = df.columns.get_loc("':'")
-
-        # Split columns based on the artificial column separator
-        table_names = [main_table] + list(joins.keys())  # Table names in the order they appear
-        start = 0
-        new_columns = []
-        columns = list(df.columns)
-        for i, idx in enumerate(fake_col_index):
-            new_columns.append([(table_names[i], c) for c in columns[start:idx]])
-            start = idx + 1
-        new_columns.append([(table_names[-1], c) for c in columns[start:]])
-        new_columns = sum(new_columns, [])
-
-        # Remove the artificial column separator ':'
-        df = df.drop("':'", axis=1)
-
-        # Create a MultiIndex
-        df.columns = pd.MultiIndex.from_tuples(new_columns)
-
-    finally:
-        # Close the connection to the database engine
-        engine.dispose()
-
+    columns = columns or {}
+    selected = []
+    with engine.connect() as connection:
+        for table in [main_table] + list(joins):
+            table_cols = columns[table] if table in columns else _join_columns(connection, table)
+            selected += [(table, col) for col in table_cols]
+    if not selected:
+        raise ValueError('No column to select')
+
+    filters = [
+        ((main_table, column) if isinstance(column, str) else tuple(column), operator, value)
+        for column, operator, value in where_condition or []
+    ]
+    statement, params = build_join(main_table, joins, selected, filters)
+    df = pd.read_sql_query(statement, con=engine, params=params)
+
+    if column_format == 'prefix':
+        df.columns = [f'{table}.{col}' for table, col in selected]
+    else:
+        df.columns = pd.MultiIndex.from_tuples(selected)
     return df
 
 
+def make_join(engine, main_table, joins):
+    """
+    Executes a join operation between the main table and specified tables.
+
+    Kept for the existing callers, it is select_join with every column of every table.
 
+    Args:
+    - engine: SQLAlchemy Engine object for database connection.
+    - main_table (str): Name of the main table.
+    - joins (dict): Tables to join, see select_join.
 
+    Returns:
+    DataFrame: Resulting DataFrame from the join operation. Columns have a MultiIndex (table_name, column_name).
+    """
+    return select_join(engine, main_table, joins)
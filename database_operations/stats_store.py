@@ -0,0 +1,214 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+
+# Largest stats table kept in memory, above it the store stays empty and callers query the database
+STORE_MAX_BYTES = 512 * 2 ** 20
+
+# Row order of the store, the one of the Arrow snapshot and of the date-sorted load_stats frames
+STORE_ORDER = ['date', 'type', 'Player']
+
+
+def _group_index(codes, n_groups):
+    """Rows of every group in the date order of the store: positions sorted by group, and where each group starts."""
+    order = np.argsort(codes, kind='stable')
+    offsets = np.searchsorted(codes[order], np.arange(n_groups + 1))
+    return order, offsets
+
+
+def estimate_nbytes(n_rows, n_columns):
+    """
+    Upper estimate of the memory of a StatsStore, without loading the table.
+
+    Every column takes at most 8 bytes per row (float64, dates, category codes are smaller)
+    and the Player and type indexes 8 bytes each.
+    """
+    return n_rows * (8 * n_columns + 16)
+
+
+class StatsStore:
+    """
+    Process-wide, read-only copy of the stats table held as contiguous numpy columns.
+
+    The rows are sorted by date, text columns are stored as category codes, and the Player
+    and type columns have an index (the rows of each value, in date order). A selection is a
+    binary search on the dates, within the rows of a player or of each type when given, so it
+    costs O(log n) plus the rows returned instead of a mask over the whole table.
+
+    Args:
+    - load (callable): Returns the whole stats table as a DataFrame, e.g. with the dtype policy applied.
+    - version (callable): Returns the data version of the source, see data_version.
+    - max_bytes (int): Memory ceiling of the columns and indexes. Default is STORE_MAX_BYTES.
+      A larger table is not kept: loaded is False and callers should query the database.
+    - estimate (callable, optional): Returns the expected memory of the table in bytes, see
+      estimate_nbytes. Checked before every load, so a table over the ceiling is never loaded.
+    """
+
+    def __init__(self, load, version, max_bytes=STORE_MAX_BYTES, estimate=None):
+        self.load = load
+        self.version = version
+        self.max_bytes = max_bytes
+        self.estimate = estimate
+        self._reload_hooks = []
+        self._lock = threading.Lock()
+        self._state = None
+        self.refresh()
+
+    @property
+    def loaded(self):
+        """True if the table is in memory, False if it is over the memory ceiling."""
+        return self._state['columns'] is not None
+
+    @property
+    def nbytes(self):
+        """Memory of the columns and indexes, in bytes."""
+        return self._state['nbytes']
+
+    def add_reload_hook(self, hook):
+        """Call hook(store) after every reload of the data, e.g. to release what was derived from the old one."""
+        self._reload_hooks.append(hook)
+
+    def refresh(self):
+        """
+        Reload the table if the data version changed since the last load.
+
+        Returns:
+        - bool: True if the table was reloaded.
+        """
+        version = self.version()
+        if self._state is not None and self._state['version'] == version:
+            return False
+        with self._lock:
+            if self._state is not None and self._state['version'] == version:
+                return False
+            # Swapped in one assignment, selections running meanwhile keep the previous state
+            self._state = self._load(version)
+        for hook in self._reload_hooks:
+            hook(self)
+        return True
+
+    def _load(self, version):
+        if self.estimate is not None:
+            estimated = self.estimate()
+            if estimated > self.max_bytes:
+                print(f'Stats table of about {estimated / 2**20:.0f} MB over the {self.max_bytes / 2**20:.0f} MB ceiling, not loaded in memory')
+                return {'version': version, 'columns': None, 'nbytes': 0}
+        return self._build(self.load(), version)
+
+    def _build(self, df, version):
+        df = df.sort_values([col for col in STORE_ORDER if col in df.columns], kind='stable', ignore_index=True)
+
+        columns, categories = {}, {}
+        for col in df.columns:
+            values = df[col]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                categories[col] = values.cat.categories
+                columns[col] = np.ascontiguousarray(values.cat.codes.to_numpy())
+            elif values.dtype == object:
+                codes, uniques = pd.factorize(values, sort=True)
+                categories[col] = pd.Index(uniques)
+                columns[col] = np.ascontiguousarray(codes)
+            else:
+                columns[col] = np.ascontiguousarray(values.to_numpy())
+
+        indexes = {
+            col: _group_index(columns[col], len(categories[col]))
+            for col in ['Player', 'type'] if col in categories
+        }
+        nbytes = sum(array.nbytes for array in columns.values())
+        nbytes += sum(order.nbytes + offsets.nbytes for order, offsets in indexes.values())
+        if nbytes > self.max_bytes:
+            print(f'Stats table of {nbytes / 2**20:.0f} MB over the {self.max_bytes / 2**20:.0f} MB ceiling, not kept in memory')
+            return {'version': version, 'columns': None, 'nbytes': 0}
+
+        return {
+            'version': version,
+            'columns': columns,
+            'categories': categories,
+            'dtypes': df.dtypes,
+            'dates': columns['date'].astype('datetime64[ns]') if 'date' in columns else None,
+            'indexes': indexes,
+            'nbytes': nbytes,
+            'n_rows': len(df),
+        }
+
+    def select(self, dates=None, types=None, category=None, columns=None, player=None):
+        """
+        Return the rows matching the filters, the counterpart of load_stats.
+
+        Args:
+        - dates (list, optional): [start] or [start, end] dates, both included.
+        - types (list, optional): Session types to keep, all if empty.
+        - category (str, optional): Category to keep, all if empty.
+        - columns (list, optional): Columns to return. If empty, returns all columns.
+        - player (str, optional): Only return the rows of this player.
+
+        Returns:
+        - pd.DataFrame: The rows sorted by date (then type and Player), with the load_stats dtypes.
+        """
+        state = self._state
+        if state['columns'] is None:
+            raise RuntimeError('The stats table is over the memory ceiling of the store, query the database instead')
+
+        positions = self._positions(state, dates, types, player)
+        if category:
+            if isinstance(positions, slice):
+                positions = np.arange(state['n_rows'])[positions]
+            # Like the SQL filter, no row matches an unknown category or a table without the column
+            code = state['categories']['category'].get_indexer([category])[0] if 'category' in state['categories'] else -1
+            positions = positions[state['columns']['category'][positions] == code] if code >= 0 else positions[:0]
+
+        columns = list(columns) if columns else list(state['columns'])
+        data = {}
+        for col in columns:
+            values = state['columns'][col][positions]
+            if col in state['categories'] and isinstance(state['dtypes'][col], pd.CategoricalDtype):
+                data[col] = pd.Categorical.from_codes(values, categories=state['categories'][col])
+            elif col in state['categories']:
+                # Code -1 is a NULL, indexing with it would return the last category
+                decoded = state['categories'][col].to_numpy(dtype=object)[values]
+                decoded[values < 0] = None
+                data[col] = decoded
+            else:
+                data[col] = values
+        return pd.DataFrame(data, columns=columns)
+
+    def _positions(self, state, dates, types, player):
+        """Rows of the filters on dates, types and player: a slice for a date range, sorted positions otherwise."""
+        if player is not None:
+            groups = [self._group_rows(state, 'Player', player)]
+        elif types:
+            groups = [self._group_rows(state, 'type', session_type) for session_type in types]
+        else:
+            return self._date_slice(state, dates, np.s_[:])
+
+        rows = np.concatenate([self._date_slice(state, dates, group) for group in groups])
+        if player is not None and types:
+            codes = state['categories']['type'].get_indexer(list(types))
+            # -1 is the code of the unknown types, but also of the NULL types
+            codes = codes[codes >= 0]
+            rows = rows[np.isin(state['columns']['type'][rows], codes)]
+        # The rows of several types are merged back in the order of the store
+        return np.sort(rows) if len(groups) > 1 else rows
+
+    def _group_rows(self, state, col, value):
+        code = state['categories'][col].get_indexer([value])[0]
+        if code < 0:
+            return np.empty(0, dtype=np.intp)
+        order, offsets = state['indexes'][col]
+        return order[offsets[code]:offsets[code + 1]]
+
+    def _date_slice(self, state, dates, rows):
+        """Restrict rows (a slice or date-ordered positions) to the dates with two binary searches."""
+        if isinstance(rows, slice):
+            row_dates = state['dates']
+        else:
+            row_dates = state['dates'][rows]
+        if not dates:
+            return rows if not isinstance(rows, slice) else np.s_[:]
+
+        first = np.searchsorted(row_dates, np.datetime64(str(dates[0])), side='left')
+        last = np.searchsorted(row_dates, np.datetime64(str(dates[1])), side='right') if len(dates) > 1 else len(row_dates)
+        return np.s_[first:last] if isinstance(rows, slice) else rows[first:last]
@@ -0,0 +1,160 @@
+import argparse
+import sys
+
+from sqlalchemy import text
+
+from database_operations.query_builder import build_select, quote_identifier, stats_filters
+
+
+# Secondary indexes of the stats table, the primary key already covers exact key lookups.
+stats_indexes = {
+    'ix_stats_player_date': ['Player', 'date'],   # Player report: one player over a period
+    'ix_stats_date_type': ['date', 'type'],       # Session report: one (date, type) session
+    'ix_stats_type_date': ['type', 'date'],       # Session type first, then period
+    'ix_stats_category_date': ['category', 'date'],
+}
+
+tables_indexes = {
+    'stats': stats_indexes,
+}
+
+
+def table_columns(connection, table_name):
+    """Return the column names of a table of the database."""
+    result = connection.execute(text(f"PRAGMA table_info({quote_identifier(table_name)})"))
+    return [row[1] for row in result.fetchall()]
+
+
+def create_indexes(engine, table_name, indexes=None):
+    """
+    Create the secondary indexes of a table if they don't already exist.
+
+    Indexes referring to columns missing from the live table are skipped.
+
+    Args:
+    - engine: SQLAlchemy Engine object for database connection.
+    - table_name (str): Name of the table to index.
+    - indexes (dict, optional): Index name -> list of columns. Defaults to the ones in tables_indexes.
+
+    Returns:
+    - list: Names of the indexes present on the table after the call.
+    """
+    with engine.begin() as connection:
+        return create_table_indexes(connection, table_name, indexes)
+
+
+def create_table_indexes(connection, table_name, indexes=None):
+    """
+    create_indexes inside the caller's transaction, e.g. the one creating or migrating the table.
+
+    Args:
+    - connection: SQLAlchemy Connection object, inside an open transaction.
+    - table_name (str): Name of the table to index.
+    - indexes (dict, optional): Index name -> list of columns. Defaults to the ones in tables_indexes.
+
+    Returns:
+    - list: Names of the indexes present on the table after the call.
+    """
+    if indexes is None:
+        indexes = tables_indexes.get(table_name, {})
+
+    created = []
+    existing_columns = table_columns(connection, table_name)
+    for index_name, columns in indexes.items():
+        missing = [col for col in columns if col not in existing_columns]
+        if missing:
+            print(f"Skipping index '{index_name}': columns {missing} not in table '{table_name}'")
+            continue
+
+        cols = ', '.join([quote_identifier(col) for col in columns])
+        connection.execute(text(
+            f'CREATE INDEX IF NOT EXISTS {quote_identifier(index_name)} '
+            f'ON {quote_identifier(table_name)} ({cols})'
+        ))
+        created.append(index_name)
+
+    return created
+
+
+def explain_query_plan(connection, statement, params=None):
+    """
+    Return the EXPLAIN QUERY PLAN details of a statement.
+
+    Args:
+    - connection: SQLAlchemy Connection object.
+    - statement (TextClause): Statement to explain.
+    - params (dict, optional): Parameters of the statement.
+
+    Returns:
+    - list: The 'detail' column of the plan, one string per step.
+    """
+    result = connection.execute(text(f'EXPLAIN QUERY PLAN {statement.text}'), params or {})
+    return [row[-1] for row in result.fetchall()]
+
+
+def stats_access_queries(player='Team Average', dates=('2023-01-01', '2023-01-31'),
+                         types=('Full Training', 'Full Match'), category='First Team'):
+    """
+    Return the filter combinations load_stats (and the player lookups) generate on the stats table.
+
+    Returns:
+    - dict: Description -> list of (column, operator, value) filters.
+    """
+    return {
+        'date from': stats_filters(dates[:1]),
+        'date range': stats_filters(dates),
+        'single session': stats_filters([dates[0]] * 2, types[:1]),
+        'date range and types': stats_filters(dates, types),
+        'types': stats_filters(types=types),
+        'category': stats_filters(category=category),
+        'date range and category': stats_filters(dates, category=category),
+        'player and date range': [('Player', '=', player)] + stats_filters(dates),
+    }
+
+
+def check_access_paths(engine, table_name='stats', queries=None):
+    """
+    Run EXPLAIN QUERY PLAN on the generated queries and report the ones doing a full scan of the table.
+
+    Queries filtering on columns missing from the live table are skipped.
+
+    Args:
+    - engine: SQLAlchemy Engine object for database connection.
+    - table_name (str): Name of the table queried. Default is 'stats'.
+    - queries (dict, optional): Description -> filters. Defaults to stats_access_queries().
+
+    Returns:
+    - dict: Description -> plan details of the queries doing a full scan, empty if none does.
+    """
+    if queries is None:
+        queries = stats_access_queries()
+
+    full_scans = {}
+    with engine.connect() as connection:
+        existing_columns = table_columns(connection, table_name)
+        for description, filters in queries.items():
+            if any(column not in existing_columns for column, _, _ in filters):
+                continue
+
+            statement, params = build_select(table_name, filters=filters)
+            plan = explain_query_plan(connection, statement, params)
+            # 'SCAN stats' and 'SCAN stats USING (COVERING) INDEX' both read the whole table
+            if any(detail.startswith(f'SCAN {table_name}') for detail in plan):
+                full_scans[description] = plan
+
+    return full_scans
+
+
+if __name__ == '__main__':
+    from database_operations.engines import get_engine
+
+    parser = argparse.ArgumentParser(description='Create the secondary indexes and verify the access paths of the stats table.')
+    parser.add_argument('db_path', help='Path of the SQLite database')
+    args = parser.parse_args()
+
+    print('Indexes:', create_indexes(get_engine(args.db_path, role='write'), 'stats'))
+
+    full_scans = check_access_paths(get_engine(args.db_path), 'stats')
+    for description, plan in full_scans.items():
+        print(f"Full scan for '{description}': {plan}")
+    sys.exit(1 if full_scans else 0)
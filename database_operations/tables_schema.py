@@ -63,4 +63,22 @@ stats_schema = {
     'type':'TEXT',
     'category':'TEXT'
 }
-stats_schema_pk = ['Player','date', 'type', 'category']
\ No newline at end of file
+stats_schema_pk = ['Player','date', 'type', 'category']
+
+# One row per source file loaded by the ingestion, used to skip the files that did not change
+ingest_manifest_schema = {
+    'path': 'TEXT',
+    'size': 'INTEGER',
+    'mtime_ns': 'INTEGER',
+    'hash': 'TEXT',
+    'date': 'Date',
+    'type': 'TEXT',
+    'primary_keys': 'TEXT',  # JSON list of the stats primary keys produced by the file
+}
+ingest_manifest_pk = ['path']
+
+tables_schemas = {
+    'stats': stats_schema,
+    'file_available': file_available_schema,
+    'ingest_manifest': ingest_manifest_schema,
+}
@@ -2,12 +2,12 @@ import re
 import streamlit as st
 from web_utils.colors import VELOCITIES_INTERVAL
 from web_utils.data_loading import *
-from datetime import datetime
 
 from web_utils.data_manipulation import convert_to_seconds, ensure_array, ensure_list, filter_velocities, sort_vel_intervals, sum_time_columns
 from web_utils.data_viz import *
 from web_utils.styles import *
 from web_utils.custom_viz import *
+from web_utils.figure_cache import cached_figure
 from web_utils.connection import GoogleDriveManager
 from streamlit_extras.stylable_container import stylable_container
 
@@ -44,8 +44,13 @@ else :
 
 
 # #MARK: Caricamento dati
-data = load_stats(st.session_state['local_save_path'], dates=dates, types=[], category='')
-data.set_index('Player', inplace=True)
+def load_player_stats(columns):
+    # Each section only reads the columns it renders, the keys are always loaded
+    data = select_stats(st.session_state['local_save_path'], dates=dates, types=[], category='',
+                        columns=['Player', 'date', 'type'] + list(columns))
+    return data.set_index('Player')
+
+data = load_player_stats([])
 metrics_dict = load_metrics()
 metrics_df = pd.DataFrame(metrics_dict)
 metrics_names = [m['name'] for m in metrics_dict]
@@ -60,15 +65,35 @@ selected_types = st.multiselect(label='Select session types',
         default = list(data.type.unique()))
 
 selected_metrics = st.multiselect(label='Select metrics',
-        options = list(data.columns),
-        default = list(data.columns)[0])
+        options = metrics_names,
+        default = metrics_names[0])
+
+granularity_col, aggregate_col = st.columns([0.5,0.5])
+granularity = granularity_col.radio(label='Granularity',
+        options = ['Session', 'Week', 'Month'],
+        horizontal = True)
+aggregate = aggregate_col.radio(label='Aggregate',
+        options = ['Session average', 'Total'],
+        horizontal = True,
+        disabled = granularity == 'Session')
 
 
+def load_overview_stats(columns):
+    # Weeks and months are read from the rollup tables (aggregated on the fly without them), one row per player, type and period
+    if granularity != 'Session':
+        rollup = load_rollups(st.session_state['local_save_path'], period=granularity.lower(), dates=dates,
+                              types=[], category='', columns=list(columns),
+                              aggregate='mean' if aggregate == 'Session average' else 'sum')
+        return rollup.set_index('Player')
+    return load_player_stats(columns)
 
 
 if len(selected_metrics) > 0:
-    fig = create_bar_chart_overview(
-        data=data,
+    fig = cached_figure(
+        create_bar_chart_overview,
+        version=data_version(st.session_state['local_save_path']),
+        load_data=lambda: load_overview_stats(selected_metrics),
+        data_key=(st.session_state['local_save_path'], granularity, aggregate),
         player=player,
         metrics_df=metrics_df,
         selected_metrics=selected_metrics,
@@ -99,13 +124,14 @@ st.divider()
 st.markdown('## Metric Detail')
 
 metrics = st.multiselect(label='Seleziona metriche',
-            options = list(data.columns),
+            options = metrics_names,
             default = selected_metrics)
     
 training_col, match_col = st.columns([0.5,0.5], gap="large")
 
-training_data = data.loc[data.type == 'Full Training']
-match_data = data.loc[data.type == 'Full Match']
+detail_data = load_player_stats(['Minutes'] + metrics)
+training_data = detail_data.loc[detail_data.type == 'Full Training']
+match_data = detail_data.loc[detail_data.type == 'Full Match']
 warns = {t:0 for t in ['Full Training', 'Full Match']}
 for idx, metric in enumerate(metrics):
     for type, type_data, col in list(zip(['Full Training', 'Full Match'], [training_data, match_data] ,[training_col, match_col])):
@@ -200,8 +226,7 @@ for idx, metric in enumerate(metrics):
                 min_date, max_date = labels.min(), labels.max()
             else:
                 min_date, max_date = labels[0], labels[0]
-            min_date = datetime.strptime(min_date, '%Y-%m-%d')
-            max_date = datetime.strptime(max_date, '%Y-%m-%d')
+            min_date, max_date = pd.Timestamp(min_date), pd.Timestamp(max_date)
             
             
 
@@ -221,10 +246,11 @@ for idx, metric in enumerate(metrics):
             fig.update_xaxes(showticklabels=True, 
                              range=[min_date-pad, max_date+pad])
 
-            # Combine tooltips to show both outer and inner values
+            # Combine tooltips to show both outer and inner values, plotly would show datetimes as numbers
+            hover_dates = pd.to_datetime(labels).strftime('%Y-%m-%d')
             for trace_outer, trace_inner in zip(fig.data[1::2], fig.data[0::2]):
-                trace_outer.customdata = list(zip(labels, inner_values, outer_times, inner_minutes))
-                trace_inner.customdata = list(zip(labels, outer_values, outer_times, inner_minutes))
+                trace_outer.customdata = list(zip(hover_dates, inner_values, outer_times, inner_minutes))
+                trace_inner.customdata = list(zip(hover_dates, outer_values, outer_times, inner_minutes))
 
                 trace_outer.hovertemplate = (
                     'Date: %{customdata[0]}  <br>' +
@@ -266,6 +292,9 @@ st.divider()
 # MARK: Analisi Accelerazioni/Decelerazioni
 st.markdown("## Analisi Accelerazioni e decelerazioni")
 training_col, match_col = st.columns([0.5,0.5], gap='large')
+acc_dec_data = load_player_stats([m for m in metrics_names if m.startswith(('D acc', 'D dec', 'T acc', 'T dec'))])
+training_data = acc_dec_data.loc[acc_dec_data.type == 'Full Training']
+match_data = acc_dec_data.loc[acc_dec_data.type == 'Full Match']
 warns = {t:0 for t in ['Full Training', 'Full Match']}
 for col, t_data, t in zip([training_col, match_col], [training_data, match_data], ['Full Training', 'Full Match']):
     with col:
@@ -276,7 +305,11 @@ for col, t_data, t in zip([training_col, match_col], [training_data, match_data]
         if warns[t]:
             continue
 
-        fig = create_divergent_bar_chart(t_data, dates, player, 
+        fig = cached_figure(create_divergent_bar_chart,
+                                    version=data_version(st.session_state['local_save_path']),
+                                    load_data=lambda: t_data,
+                                    data_key=(st.session_state['local_save_path'],),
+                                    dates=dates, player=player,
                                     col_left=['D acc 1-2 m/s2',
                                                 'D acc 2-3 m/s2', 
                                                 'D acc 3-4 m/s2', 
@@ -311,7 +344,11 @@ for col, t_data, t in zip([training_col, match_col], [training_data, match_data]
                                     """]):
             st.plotly_chart(fig, use_container_width = True)
 
-        fig = create_divergent_bar_chart(t_data, dates, player, 
+        fig = cached_figure(create_divergent_bar_chart,
+                                    version=data_version(st.session_state['local_save_path']),
+                                    load_data=lambda: t_data,
+                                    data_key=(st.session_state['local_save_path'],),
+                                    dates=dates, player=player,
                                     col_left=['T acc 1-2 m/s2',
         'T acc 2-3 m/s2', 'T acc 3-4 m/s2', 'T acc > 4 m/s2', 'T acc > 5 m/s2',], 
                                     col_right = ['T dec -2 & -1 m/s2',
@@ -370,6 +407,9 @@ else:
     vel_intervals = sort_vel_intervals(vel_intervals)
 
     velocities_distance, velocities_temp = filter_velocities(vel_intervals, velocities_distance, velocities_temp)
+    velocities_data = load_player_stats(velocities_distance + velocities_temp)
+    training_data = velocities_data.loc[velocities_data.type == 'Full Training']
+    match_data = velocities_data.loc[velocities_data.type == 'Full Match']
     warns = {t:0 for t in ['Full Training', 'Full Match']}
     for col, t_data, t in zip([training_col, match_col], [training_data, match_data], ['Full Training', 'Full Match']):
 
@@ -387,8 +427,7 @@ else:
                 min_date, max_date = labels.min(), labels.max()
             else:
                 min_date, max_date = labels[0], labels[0]
-            min_date = datetime.strptime(min_date, '%Y-%m-%d')
-            max_date = datetime.strptime(max_date, '%Y-%m-%d')
+            min_date, max_date = pd.Timestamp(min_date), pd.Timestamp(max_date)
 
             fig = None
             for vel_c, v_int in zip(velocities_distance, vel_intervals):
@@ -10,6 +10,7 @@ from streamlit_extras.stylable_container import stylable_container
 
 from web_utils.custom_viz import create_session_bar_overview
 from web_utils.data_loading import *
+from web_utils.figure_cache import cached_figure
 from web_utils.styles import *
 
 
@@ -33,33 +34,13 @@ session_date = st.sidebar.selectbox(label="Select session date (yyyy-mm-dd)",
               options=file_available.loc[(file_available.type == session_type), 'date'].unique())
 
 
-#MARK: Load the data
-session_data = load_stats(
-    db_path=st.session_state['local_save_path'],
-    dates = [session_date]*2,
-    types= [session_type],
-    category=''
-)
-
 metrics = load_metrics()
 metrics_df = pd.DataFrame(metrics)
 metrics_names = [m['name'] for m in metrics]
 
 #MARK: Session stats
-with stylable_container(key = f'session_overview_kpi', css_styles = "div[data-testid='stMetric']{"+shadow_effect_kpi+"}"):       
-    
-    presence_col, duration_col = st.columns(2, gap = 'large', vertical_alignment = 'center')
-
-    with presence_col:
-        st.metric(
-                label=f'Players involved',
-                value=len(session_data)-1,
-            )
-    with duration_col:
-        st.metric(
-            label='Total session time (minutes)',
-            value = session_data.Minutes.max(),
-        )
+# Filled once the data is loaded, the metrics to load are selected below
+session_stats_container = st.container()
 
 st.divider()
 
@@ -83,12 +64,39 @@ with overview_selectors[2]:
         index = 0
     )
 
+#MARK: Load the data
+session_data = select_stats(
+    db_path=st.session_state['local_save_path'],
+    dates = [session_date]*2,
+    types= [session_type],
+    category='',
+    columns=['Player', 'Minutes'] + selected_metrics
+)
+
+with session_stats_container, stylable_container(key = f'session_overview_kpi', css_styles = "div[data-testid='stMetric']{"+shadow_effect_kpi+"}"):       
+    
+    presence_col, duration_col = st.columns(2, gap = 'large', vertical_alignment = 'center')
+
+    with presence_col:
+        st.metric(
+                label=f'Players involved',
+                value=len(session_data)-1,
+            )
+    with duration_col:
+        st.metric(
+            label='Total session time (minutes)',
+            value = session_data.Minutes.max(),
+        )
+
 if len(selected_metrics) == 0:
     st.warning('Please select at least a metric')
     st.stop()
 
-fig = create_session_bar_overview(
-    data = session_data,
+fig = cached_figure(
+    create_session_bar_overview,
+    version=data_version(st.session_state['local_save_path']),
+    load_data=lambda: session_data,
+    data_key=(st.session_state['local_save_path'],),
     metrics_df=metrics_df,
     selected_metrics=selected_metrics,
     session_type=session_type,
@@ -7,6 +7,8 @@ from googleapiclient.discovery import build
 from googleapiclient.http import MediaFileUpload, MediaIoBaseDownload
 import toml
 
+from database_operations.engines import checkpoint
+
 class GoogleDriveManager:
     
     def __init__(self, credentials_path):
@@ -96,6 +98,10 @@ class GoogleDriveManager:
             print(f"File '{local_path}' does not exist.")
             return
 
+        # A SQLite database in WAL mode may hold its last commits in the -wal file, not uploaded
+        if os.path.isfile(f'{local_path}-wal'):
+            checkpoint(local_path)
+
         file_name = os.path.basename(local_path)
 
         # Handle the case where gdrive_path is empty
@@ -89,7 +89,7 @@ def create_bar_chart_overview(data, player, metrics_df, selected_metrics, select
         fig.layout[f'yaxis{i}'].title.text = ''
 
     for i, m in enumerate(selected_metrics):
-        player_avg = data.loc[player, m].mean()
+        player_avg = data.loc[player, m].astype(np.float64).mean()
 
         fig.add_hline(y=player_avg, row=len(selected_metrics)-i, col=1, line_dash="dot",
                     line_color='red',
@@ -212,7 +212,7 @@ def create_session_bar_overview(data, metrics_df, selected_metrics, session_type
             by= metric if sort_by == 'Metric' else 'Player',
             ascending = horizontal
         )
-        avg_value = players_data[metric].mean()
+        avg_value = players_data[metric].astype(np.float64).mean()
         
         custom_data = []
         for val in subplot_data[metric]:
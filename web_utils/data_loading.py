@@ -1,54 +1,386 @@
 import json
 import os
-from sqlalchemy import create_engine
+from database_operations import arrow_snapshot, engines, federation, parquet_store
+from database_operations.data_version import data_version
+from database_operations.disk_cache import DISK_CACHE_DIR, DISK_CACHE_MAX_BYTES, DiskCache
+from database_operations.dtype_policy import apply_dtype_policy, memory_report
+from database_operations.range_cache import RangeCache
+from database_operations.stats_store import STORE_MAX_BYTES, StatsStore, estimate_nbytes
+from database_operations.tables_schema import stats_schema
+from database_operations.migrations import migrate_database
+from database_operations.query_builder import quote_identifier, stats_filters
+from database_operations.rollups import ROLLUP_AGGREGATES, ROLLUP_KEYS, period_start, rollup_averages, rollup_column_name, rollup_table_name
+from database_operations.tables_indexes import table_columns
 from database_operations.sql_queries import *
+from web_utils.data_manipulation import aggregate_chunks
 
 
 import os.path as osp
 
+import pyarrow as pa
+
 import streamlit as st
 
 
-def get_engine(db_path=osp.join('data', 'spezia_22_23.db')):
-    engine = create_engine(f'sqlite:///{db_path}', echo=False)
+# Bounds of the data caches. Their keys hold the data version, so entries of older data are
+# never served again: the bounds only release them, while entries of unchanged data stay warm.
+CACHE_MAX_ENTRIES = 64
+CACHE_TTL = 60 * 60  # seconds
 
-    return engine
+@st.cache_resource
+def get_engine(db_path=osp.join('data', 'spezia_22_23.db'), role='read'):
+    # Engines are pooled and shared by every Streamlit session, never dispose them
+    return engines.get_engine(db_path, role)
+
+@st.cache_resource
+def disk_cache():
+    # One per process, the folder is shared with the other processes. None when disabled or
+    # when the folder can not be created, e.g. on a read-only deployment
+    if not DISK_CACHE_DIR:
+        return None
+    cache = DiskCache(DISK_CACHE_DIR, DISK_CACHE_MAX_BYTES)
+    return cache if cache.enabled else None
+
+def disk_cached_frame(key, read):
+    """
+    Return the frame stored under key in the disk cache, or read() it and store it.
+
+    The disk cache is the tier behind the memory caches: it survives restarts and is shared
+    by the server processes. The key must hold the data version.
+
+    Args:
+    - key (tuple): Key of the frame, tuple of strings and numbers.
+    - read (callable): Returns the frame when it is not cached.
+
+    Returns:
+    - pd.DataFrame: The frame, with the dtypes it was stored with.
+    """
+    cache = disk_cache()
+    if cache is None:
+        return read()
+    df = cache.get_frame(key)
+    if df is None:
+        df = read()
+        cache.put_frame(key, df)
+    return df
+
+@st.cache_resource
+def check_schema(db_path):
+    # Once per process: a single query when the database is up to date, the pending migrations otherwise.
+    # Only new columns are added: rebuilds and dropped columns are left to python -m database_operations.migrations
+    if parquet_store.is_parquet_store(db_path) or not osp.exists(db_path):
+        return {}
+    if federation.is_federation(db_path):
+        return {season: check_schema(season_path) for season, season_path in federation.load_seasons(db_path).items()}
+    migrations = migrate_database(engines.get_engine(db_path, role='write'), check_engine=get_engine(db_path), rebuild=False)
+    if migrations:
+        # The write engine switched the database to WAL, keep the file complete on its own
+        engines.checkpoint(db_path)
+    return migrations
+
+# Tables of the SQLite databases whose full reads come from their memory-mapped Arrow snapshot
+SNAPSHOT_TABLES = ['stats']
+
+def _use_snapshot(db_path, from_table, where_condition):
+    """
+    True if the read should come from the Arrow snapshot of the table.
+
+    Only unfiltered reads do (e.g. the load of the StatsStore): filtered ones keep the SQL
+    pushdown, indexes and bound parameters. If the snapshot can not be written or read, e.g.
+    in a read-only data folder, the read falls back to SQLite.
+    """
+    if from_table not in SNAPSHOT_TABLES or where_condition:
+        return False
+    try:
+        arrow_snapshot.load_snapshot(db_path, from_table)
+    except (OSError, pa.ArrowException) as e:
+        print(f"Arrow snapshot of '{from_table}' unavailable, reading SQLite: {e}")
+        return False
+    return True
+
+def select_from_source(db_path, from_table, cols_to_select=[], where_condition=None):
+    """
+    select_from on the storage backend found at db_path: a SQLite file, a Parquet store folder
+    or a federation of season databases.
+    """
+    if federation.is_federation(db_path):
+        return federation.select_from(db_path, from_table, cols_to_select, where_condition)
+    if parquet_store.is_parquet_store(db_path):
+        return parquet_store.select_from(db_path, from_table, cols_to_select, where_condition)
+    if _use_snapshot(db_path, from_table, where_condition):
+        return arrow_snapshot.select_from(db_path, from_table, cols_to_select, where_condition)
+    return select_from(get_engine(db_path), from_table, cols_to_select, where_condition)
+
+def iter_select_from_source(db_path, from_table, cols_to_select=[], where_condition=None, chunk_size=10000, arrow=False):
+    """
+    iter_select_from on the storage backend found at db_path, see select_from_source.
+    """
+    if federation.is_federation(db_path):
+        return federation.iter_select_from(db_path, from_table, cols_to_select, where_condition, chunk_size, arrow)
+    if parquet_store.is_parquet_store(db_path):
+        return parquet_store.iter_select_from(db_path, from_table, cols_to_select, where_condition, chunk_size, arrow)
+    if _use_snapshot(db_path, from_table, where_condition):
+        return arrow_snapshot.iter_select_from(db_path, from_table, cols_to_select, where_condition, chunk_size, arrow)
+    return iter_select_from(get_engine(db_path), from_table, cols_to_select, where_condition, chunk_size, arrow)
 
-@st.cache_data
 def load_files(db_path):
-    df = select_from(engine=get_engine(db_path),
+    """
+    Load the sessions available in the database, cached until the data changes.
+
+    Args:
+    - db_path (str): Path of the SQLite database.
+
+    Returns:
+    - pd.DataFrame: The file_available rows, with the dates as datetime.date.
+    """
+    return _load_files(db_path, data_version(db_path))
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL)
+def _load_files(db_path, version):
+    return disk_cached_frame(('file_available', osp.abspath(db_path), version), lambda: _read_files(db_path))
+
+def _read_files(db_path):
+    df = select_from_source(db_path,
                        from_table='file_available',
                        )
     df['date'] = pd.to_datetime(df['date'], format='%Y-%m-%d').dt.date
     return df
 
-@st.cache_data
-def load_stats(db_path, dates, types, category):
-    where_condition = ""
+def load_stats(db_path, dates, types, category, columns=None):
+    """
+    Load the stats rows matching the filters, only reading the requested columns.
+
+    Args:
+    - db_path (str): Path of the SQLite database.
+    - dates (list): [start] or [start, end] dates, both included.
+    - types (list): Session types to keep, all if empty.
+    - category (str): Category to keep, all if empty.
+    - columns (list, optional): Columns to select. If empty, selects all columns.
+
+    Returns:
+    - pd.DataFrame: The stats rows, cached until the data changes. With dates they are sorted by date
+      and answered by stats_range_cache, so a narrower range than a cached one is a slice of it.
+    """
+    # The projection is part of the cache key, drop duplicates so equivalent requests share an entry
+    columns = tuple(dict.fromkeys(columns)) if columns else ()
+    version, types = data_version(db_path), tuple(types) if types else ()
+    if not dates:
+        return _load_stats(db_path, version, (), types, category, columns)
+
+    # The range cache slices on the dates, they are read even when not requested
+    range_columns = columns if not columns or 'date' in columns else columns + ('date',)
+    df = stats_range_cache(db_path).get((db_path, version, types, category, range_columns), *dates[:2])
+    return df if range_columns == columns else df.drop(columns='date')
+
+def iter_stats(db_path, dates, types, category, columns=None, chunk_size=10000, arrow=False):
+    """
+    Streaming variant of load_stats for season-wide exports and aggregations, see aggregate_chunks.
+
+    The chunks are not cached, each call reads the rows again.
+
+    Args:
+    - db_path (str): Path of the SQLite database.
+    - dates (list): [start] or [start, end] dates, both included.
+    - types (list): Session types to keep, all if empty.
+    - category (str): Category to keep, all if empty.
+    - columns (list, optional): Columns to select. If empty, selects all columns.
+    - chunk_size (int): Maximum number of rows per chunk. Default is 10000.
+    - arrow (bool): Yield pyarrow RecordBatches instead of DataFrames. Default is False.
+
+    Yields:
+    - pd.DataFrame or pa.RecordBatch: The next chunk of stats rows.
+    """
+    columns = list(dict.fromkeys(columns)) if columns else []
+    yield from iter_select_from_source(db_path, 'stats', columns, stats_filters(dates, types, category), chunk_size, arrow)
+
+# Memory report (see memory_report) of every frame loaded by _load_stats, by cache key
+memory_reports = {}
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL)
+def _load_stats(db_path, version, dates, types, category, columns):
+    return _read_stats(db_path, version, stats_filters(dates, types, category), columns)
 
+def _read_stats(db_path, version, filters, columns):
+    # Frames found on disk are already compact, only the ones read from the database are reported
+    key = ('stats', osp.abspath(db_path), version, repr(filters), columns)
+    return disk_cached_frame(key, lambda: _read_compact_stats(db_path, version, filters, columns))
+
+def _read_compact_stats(db_path, version, filters, columns):
+    df = select_from_source(db_path, 
+                from_table='stats',
+                cols_to_select=list(columns),
+                where_condition=filters)
+    # Converted once here, the cached copy is the compact one
+    compact = apply_dtype_policy(df, {**stats_schema, federation.SEASON_COLUMN: 'TEXT'})
+    memory_reports[(db_path, version, repr(filters), columns)] = memory_report(df, compact)
+    # Kept for as many frames as the cache holds
+    for key in list(memory_reports)[:-CACHE_MAX_ENTRIES]:
+        del memory_reports[key]
+    return compact
+
+def _fetch_stats_range(key, date_filters):
+    db_path, version, types, category, columns = key
+    return _read_stats(db_path, version, date_filters + stats_filters(types=types, category=category), columns)
+
+@st.cache_resource
+def stats_range_cache(db_path):
+    # One per database and process, shared by every session: see RangeCache
+    return RangeCache(_fetch_stats_range, max_entries=CACHE_MAX_ENTRIES)
+
+def stats_memory_report():
+    """
+    Return the memory saved by the dtype policy on the stats frames loaded so far.
+
+    Returns:
+    - pd.DataFrame: One row per loaded frame (db_path, version, filters, columns) with
+      its 'bytes_before', 'bytes_after' and 'saved' fraction.
+    """
+    totals = [report.loc['Total', ['bytes_before', 'bytes_after', 'saved']] for report in memory_reports.values()]
+    return pd.DataFrame(totals, index=pd.Index(list(memory_reports), tupleize_cols=False))
+
+# Memory ceiling of the in-memory stats table, bigger tables are queried with load_stats
+STATS_STORE_MAX_BYTES = STORE_MAX_BYTES
+
+def table_shape_source(db_path, table_name):
+    """
+    Return the (rows, columns) of a table on the storage backend found at db_path, see
+    select_from_source. Only metadata and a COUNT(*) are read, never the Arrow snapshot.
+    """
+    if federation.is_federation(db_path):
+        return federation.table_shape(db_path, table_name)
+    if parquet_store.is_parquet_store(db_path):
+        return parquet_store.table_shape(db_path, table_name)
+    with get_engine(db_path).connect() as connection:
+        columns = table_columns(connection, table_name)
+        if not columns:
+            return 0, 0
+        n_rows = connection.execute(text(f'SELECT COUNT(*) FROM {quote_identifier(table_name)}')).scalar()
+    return n_rows, len(columns)
+
+def _estimate_stats_store(db_path):
+    """Expected memory of the StatsStore of the database, from its rows and columns, see estimate_nbytes."""
+    return estimate_nbytes(*table_shape_source(db_path, 'stats'))
+
+@st.cache_resource
+def stats_store(db_path):
+    # One per database and process, shared by every session: see StatsStore
+    store = StatsStore(
+        load=lambda: _read_stats(db_path, data_version(db_path), [], ()),
+        version=lambda: data_version(db_path),
+        max_bytes=STATS_STORE_MAX_BYTES,
+        estimate=lambda: _estimate_stats_store(db_path),
+    )
+    # The store now holds the new data, the ranges cached from the old one are released
+    store.add_reload_hook(lambda store: stats_range_cache(db_path).clear())
+    return store
+
+def select_stats(db_path, dates, types, category, columns=None, player=None):
+    """
+    Select the stats rows matching the filters from the in-memory StatsStore of the database.
+
+    The store is loaded once per process and reloaded when the data changes. Tables over
+    its memory ceiling are read with load_stats instead.
+
+    Args:
+    - db_path (str): Path of the SQLite database.
+    - dates (list): [start] or [start, end] dates, both included.
+    - types (list): Session types to keep, all if empty.
+    - category (str): Category to keep, all if empty.
+    - columns (list, optional): Columns to select. If empty, selects all columns.
+    - player (str, optional): Only select the rows of this player.
+
+    Returns:
+    - pd.DataFrame: The stats rows sorted by date, with the dtypes of load_stats.
+    """
+    columns = list(dict.fromkeys(columns)) if columns else []
+    store = stats_store(db_path)
+    store.refresh()
+    if store.loaded:
+        return store.select(dates, types, category, columns, player)
+
+    df = load_stats(db_path, dates, types, category, columns)
+    return df if player is None else df.loc[df.Player == player].reset_index(drop=True)
+
+
+def load_rollups(db_path, period, dates, types, category, columns, aggregate='mean'):
+    """
+    Load one value per player, session type and period from the rollup tables.
+
+    Periods overlapping the dates are returned whole. Cached until the data changes.
+
+    Args:
+    - db_path (str): Path of the SQLite database.
+    - period (str): 'week' or 'month'.
+    - dates (list): [start] or [start, end] dates, both included.
+    - types (list): Session types to keep, all if empty.
+    - category (str): Category to keep, all if empty.
+    - columns (list): Metrics to load.
+    - aggregate (str): 'mean' (average per session), 'sum', 'min' or 'max'. Default is 'mean'.
+
+    Returns:
+    - pd.DataFrame: Player, type, date (first day of the period), sessions and the metrics.
+      Databases without rollup tables (Parquet stores, federations) are aggregated on the fly
+      from the stats rows, chunk by chunk.
+    """
+    return _load_rollups(db_path, data_version(db_path), period, dates, types, category, columns, aggregate)
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL)
+def _load_rollups(db_path, version, period, dates, types, category, columns, aggregate):
+    table_name = rollup_table_name('stats', period)
+    if (parquet_store.is_parquet_store(db_path) or federation.is_federation(db_path)
+            or not table_exists(get_engine(db_path), table_name)):
+        return _stream_rollups(db_path, period, dates, types, category, columns, aggregate)
+    with get_engine(db_path).connect() as connection:
+        existing_columns = table_columns(connection, table_name)
+
+    filters = []
     if dates:
-        # Build the date condition
-        where_condition = f"date >= '{dates[0]}'"
+        filters.append(('period_start', '>=', period_start(pd.Series([dates[0]]), period).iloc[0]))
         if len(dates) > 1:
-            where_condition += f" AND date <= '{dates[1]}'"
+            filters.append(('period_start', '<=', str(dates[1])))
+    filters += stats_filters(types=types, category=category)
 
-    # Build the type list condition
-    if types:
-        if where_condition:
-            where_condition += ' AND'
-        types_str = ", ".join(f"'{t}'" for t in types)
-        where_condition += f" type IN ({types_str})"
+    aggregates = ['sum', 'count'] if aggregate == 'mean' else [aggregate]
+    rollup_columns = [col for col in ROLLUP_KEYS + ['period_start', 'sessions'] if col in existing_columns]
+    rollup_columns += [rollup_column_name(col, agg) for col in columns for agg in aggregates]
 
-    if category:
-        if where_condition:
-            where_condition += ' AND'
-        where_condition += f" category = '{category}'"
+    rollup = select_from(get_engine(db_path), table_name, rollup_columns, filters)
+    return rollup_averages(rollup, columns, aggregate)
 
-    print(where_condition)
+def _stream_rollups(db_path, period, dates, types, category, columns, aggregate):
+    """
+    Rollup rows aggregated from a stream of stats chunks (see iter_stats and aggregate_chunks),
+    for the databases without rollup tables. Memory depends on the number of groups, not of rows.
+    """
+    keys = list(ROLLUP_KEYS)
+    if not (parquet_store.is_parquet_store(db_path) or federation.is_federation(db_path)):
+        with get_engine(db_path).connect() as connection:
+            keys = [key for key in keys if key in table_columns(connection, 'stats')]
 
-    return select_from(engine=get_engine(db_path), 
-                from_table='stats',
-                where_condition=where_condition)
+    # Whole periods, like the rollup tables: from the start of the first one to the end of the last one
+    stream_dates = []
+    if dates:
+        stream_dates = [period_start(pd.Series([dates[0]]), period).iloc[0]]
+        if len(dates) > 1:
+            stream_dates.append(str((pd.Timestamp(dates[1]) + pd.DateOffset(months=1)).date()))
+
+    def chunks():
+        for chunk in iter_stats(db_path, stream_dates, types, category, keys + ['date'] + list(columns)):
+            chunk = chunk.assign(period_start=period_start(chunk['date'], period).values, sessions=1)
+            if dates and len(dates) > 1:
+                chunk = chunk.loc[chunk['period_start'] <= str(dates[1])]
+            yield chunk
+
+    aggregates = ROLLUP_AGGREGATES
+    result = aggregate_chunks(chunks(), keys + ['period_start'], ['sessions'] + list(columns), aggregates)
+    rollup = {'sessions': result[('sessions', 'sum')].astype(int)}
+    for col in columns:
+        for agg in aggregates:
+            # SUM of no value is NULL in the rollup tables
+            values = result[(col, agg)]
+            rollup[rollup_column_name(col, agg)] = values.where(result[(col, 'count')] > 0) if agg == 'sum' else values
+    rollup = pd.DataFrame(rollup, index=result.index)
+    return rollup_averages(rollup.reset_index(), columns, aggregate)
 
 
 @st.cache_data
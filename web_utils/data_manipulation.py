@@ -13,7 +13,92 @@ def convert_to_seconds(time_str):
 
 # Apply the function to each value in the pandas Series
 def convert_series_to_seconds(time_series):
-    return time_series.apply(convert_to_seconds)
+    return parse_durations(time_series)
+
+
+def _digits(fixed_width, positions):
+    """Integer value of the ASCII digits at the given positions of a (n, width) uint8 array, -1 if not digits."""
+    digits = fixed_width[:, positions].astype(np.int64) - ord('0')
+    valid = ((digits >= 0) & (digits <= 9)).all(axis=1)
+    value = np.zeros(len(fixed_width), dtype=np.int64)
+    for i in range(len(positions)):
+        value = value * 10 + digits[:, i]
+    return np.where(valid, value, -1)
+
+
+def _parse_fixed_width(values, width):
+    """Seconds of 'HH:MM:SS' (width 8) or 'MM:SS' (width 5) ASCII strings, NaN where malformed."""
+    fixed_width = np.frombuffer(values.astype(f'S{width}').tobytes(), dtype=np.uint8).reshape(-1, width)
+    if width == 8:
+        colons = (fixed_width[:, 2] == ord(':')) & (fixed_width[:, 5] == ord(':'))
+        hours, minutes, seconds = _digits(fixed_width, [0, 1]), _digits(fixed_width, [3, 4]), _digits(fixed_width, [6, 7])
+    else:
+        colons = fixed_width[:, 2] == ord(':')
+        hours, minutes, seconds = np.zeros(len(fixed_width), dtype=np.int64), _digits(fixed_width, [0, 1]), _digits(fixed_width, [3, 4])
+    valid = colons & (hours >= 0) & (minutes >= 0) & (minutes < 60) & (seconds >= 0) & (seconds < 60)
+    return np.where(valid, hours * 3600 + minutes * 60 + seconds, np.nan)
+
+
+def _parse_split(values):
+    """Seconds of duration strings of any width, splitting on ':' ('H:MM:SS', '100:00:00', '5:07'), NaN where malformed."""
+    parts = pd.Series(values, dtype=object).str.split(':', expand=True)
+    n_parts = parts.notna().sum(axis=1).to_numpy()
+    numbers = parts.apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+
+    seconds = np.full(len(values), np.nan)
+    for n in range(1, min(numbers.shape[1], 3) + 1):
+        rows = np.flatnonzero((n_parts == n) & ~np.isnan(numbers[:, :n]).any(axis=1))
+        # Right align the parts as hours, minutes, seconds
+        hms = np.zeros((len(rows), 3))
+        hms[:, 3 - n:] = numbers[rows, :n]
+        valid = (hms >= 0).all(axis=1) & (hms[:, 2] < 60) & ((n < 3) | (hms[:, 1] < 60))
+        seconds[rows[valid]] = hms[valid] @ np.array([3600, 60, 1])
+    return seconds
+
+
+def parse_durations(values):
+    """
+    Convert durations written as 'HH:MM:SS' or 'MM:SS' to seconds, a whole column or frame at once.
+
+    Every distinct string is parsed only once, with integer arithmetic on the characters for the
+    usual fixed width formats and splitting on ':' for the others. Numbers are taken as seconds
+    already, blank and malformed cells become NaN.
+
+    Args:
+    - values (pd.Series, pd.DataFrame or list): Durations to convert.
+
+    Returns:
+    - pd.Series or pd.DataFrame: The durations in seconds as floats, with the same index and columns.
+    """
+    if isinstance(values, pd.DataFrame):
+        # Parse all the cells together so that the durations shared by several columns are parsed once
+        seconds = parse_durations(pd.Series(values.to_numpy().ravel(order='F')))
+        return pd.DataFrame(seconds.to_numpy().reshape(values.shape, order='F'),
+                            index=values.index, columns=values.columns)
+
+    series = values if isinstance(values, pd.Series) else pd.Series(values)
+    if series.empty or pd.api.types.is_numeric_dtype(series):
+        return series.astype(float)
+
+    codes, uniques = pd.factorize(series)
+    uniques = pd.Series(uniques, dtype=object)
+    numbers = pd.to_numeric(uniques, errors='coerce')
+    strings = uniques.where(numbers.isna()).astype(str).str.strip()
+
+    parsed = numbers.to_numpy(dtype=float)
+    lengths = strings.str.len().to_numpy(dtype=float)
+    is_ascii = strings.map(str.isascii).to_numpy(dtype=bool)
+    todo = np.isnan(parsed) & uniques.map(lambda v: isinstance(v, str)).to_numpy(dtype=bool)
+    for width in (8, 5):
+        rows = todo & is_ascii & (lengths == width)
+        parsed[rows] = _parse_fixed_width(strings[rows].to_numpy(dtype=str), width)
+        # Same width but other layouts ('1:2:3', '1:02:3') are left to _parse_split
+        todo &= ~(rows & ~np.isnan(parsed))
+    if todo.any():
+        parsed[todo] = _parse_split(strings[todo].to_numpy())
+
+    seconds = np.where(codes < 0, np.nan, parsed[codes]) if len(parsed) else np.full(len(codes), np.nan)
+    return pd.Series(seconds, index=series.index, name=series.name)
 
 
 def sort_vel_intervals(vel_intervals):
@@ -55,10 +140,18 @@ def ensure_array(value):
     """
     Ensure the input is a numpy array. If the input is a pd.Series, convert it to a numpy array.
     If the input is a single value, wrap it in a numpy array.
+    Numbers are widened to float64 and int64: the cached frames hold compact dtypes (see
+    apply_dtype_policy) but totals, averages and chart labels are computed at full width.
     """
     if isinstance(value, pd.Series) or isinstance(value, pd.Series):
-        return value.to_numpy()
-    return np.array([value])
+        array = value.to_numpy()
+    else:
+        array = np.array([value])
+    if array.dtype.kind == 'f':
+        return array.astype(np.float64, copy=False)
+    if array.dtype.kind in 'iu':
+        return array.astype(np.int64, copy=False)
+    return array
 
 
 # Function to convert time string to total seconds
@@ -72,14 +165,11 @@ def convert_to_time_string(total_seconds):
     return str(timedelta(seconds=total_seconds))
 
 def sum_time_columns(df):
-    if isinstance(df, pd.Series) == 1:
-        #df_seconds = df.applymap(convert_to_seconds)
-        sum_seconds = convert_to_seconds(df.iloc)  # Directly take the first row if it's a single row
+    if isinstance(df, pd.Series):
+        sum_seconds = parse_durations(df)  # A single row, each value is its own total
     else:
-        df_seconds = df.applymap(convert_to_seconds)
-        sum_seconds = df_seconds.sum()
+        sum_seconds = parse_durations(df).sum()
 
-    
     return sum_seconds
 
 
@@ -98,4 +188,47 @@ def convert_comma_float(value):
         value = value.replace(',', '.')
         
     # Convert the string to a float
-    return float(value)
\ No newline at end of file
+    return float(value)
+
+# How the partial aggregates of two chunks combine into the aggregate of both
+_PARTIAL_COMBINE = {'sum': 'sum', 'count': 'sum', 'min': 'min', 'max': 'max'}
+
+
+def aggregate_chunks(chunks, by, columns, aggregates=('sum', 'count', 'mean', 'min', 'max')):
+    """
+    Group and aggregate a stream of chunks, e.g. from iter_select_from, one chunk at a time.
+
+    Each chunk is reduced to its partial sums, counts, minima and maxima per group, which are
+    merged into the running result, so memory depends on the number of groups and not on the
+    number of rows. The mean is derived from the merged sums and counts.
+
+    Args:
+    - chunks (iterable): DataFrames or pyarrow RecordBatches with the by and columns columns.
+    - by (list): Columns to group by.
+    - columns (list): Numeric columns to aggregate.
+    - aggregates (tuple): Aggregates to return among 'sum', 'count', 'mean', 'min' and 'max'.
+
+    Returns:
+    - pd.DataFrame: One row per group, indexed by the by columns, with (column, aggregate) columns.
+    """
+    by, columns = list(by), list(columns)
+    result = None
+    for chunk in chunks:
+        if not isinstance(chunk, pd.DataFrame):
+            chunk = chunk.to_pandas()
+        # observed: categorical keys only give the groups present, not every combination of categories
+        partial = chunk.groupby(by, sort=False, dropna=False, observed=True)[columns].agg(list(_PARTIAL_COMBINE))
+        if result is not None:
+            partial = pd.concat([result, partial]).groupby(level=by, sort=False, dropna=False, observed=True).agg(
+                {col: _PARTIAL_COMBINE[col[1]] for col in partial.columns}
+            )
+        result = partial
+
+    if result is None:
+        index = pd.MultiIndex.from_arrays([[]] * len(by), names=by) if len(by) > 1 else pd.Index([], name=by[0])
+        result = pd.DataFrame(index=index, columns=pd.MultiIndex.from_product([columns, list(_PARTIAL_COMBINE)]), dtype=float)
+
+    # Added in one concat, inserting them one by one fragments the frame of wide metric sets
+    means = pd.DataFrame({(col, 'mean'): result[(col, 'sum')] / result[(col, 'count')] for col in columns}, index=result.index)
+    result = pd.concat([result, means], axis=1)
+    return result[[(col, agg) for col in columns for agg in aggregates]].sort_index()
@@ -0,0 +1,131 @@
+import datetime
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import streamlit as st
+
+from web_utils.data_loading import disk_cache
+
+
+# Total size of the figures kept by figure_cache, the least recently used are dropped beyond it
+FIGURE_CACHE_MAX_BYTES = 64 * 2 ** 20
+
+
+class FigureCache:
+    """
+    Least recently used cache of plotly figures stored as JSON, bounded by their total size.
+
+    Args:
+    - max_bytes (int): Total size of the JSON strings kept. Default is FIGURE_CACHE_MAX_BYTES.
+    """
+
+    def __init__(self, max_bytes=FIGURE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the JSON of the figure stored under key, None if there is none."""
+        with self._lock:
+            figure_json = self._entries.get(key)
+            if figure_json is None:
+                self.stats['misses'] += 1
+                return None
+            self.stats['hits'] += 1
+            self._entries.move_to_end(key)
+            return figure_json
+
+    def put(self, key, figure_json):
+        """Store the JSON of a figure under key, dropping the least recently used ones to stay under max_bytes."""
+        size = len(figure_json.encode())
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.nbytes -= len(self._entries.pop(key).encode())
+            self._entries[key] = figure_json
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                _, dropped = self._entries.popitem(last=False)
+                self.nbytes -= len(dropped.encode())
+                self.stats['evictions'] += 1
+
+    def clear(self):
+        """Drop every figure."""
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+
+@st.cache_resource
+def figure_cache():
+    # One per process, shared by every session
+    return FigureCache(FIGURE_CACHE_MAX_BYTES)
+
+
+def normalize_figure_arg(value):
+    """
+    Turn a builder argument into a hashable value equal for equivalent arguments.
+
+    Dates of any type become 'YYYY-MM-DD' strings, sequences become tuples, numpy scalars
+    Python ones, and DataFrames (e.g. the metrics glossary) the hash of their content.
+    """
+    if isinstance(value, pd.DataFrame):
+        return hashlib.sha1(value.to_json().encode()).hexdigest()
+    if isinstance(value, (datetime.date, np.datetime64)):
+        timestamp = pd.Timestamp(value)
+        return str(timestamp.date()) if timestamp == timestamp.normalize() else timestamp.isoformat()
+    if isinstance(value, (list, tuple, pd.Index, pd.Series, np.ndarray)):
+        return tuple(normalize_figure_arg(item) for item in value)
+    if isinstance(value, dict):
+        return tuple((key, normalize_figure_arg(item)) for key, item in sorted(value.items()))
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def cached_figure(builder, version, load_data, data_key=(), **kwargs):
+    """
+    Build a figure with builder(data, **kwargs), or rebuild it from the JSON cached by a previous call.
+
+    The JSON is looked up in the figure_cache of the process, then in the disk cache (see
+    disk_cache) shared by the processes and restarts.
+
+    The key is the builder name, the data version and the normalized arguments (see
+    normalize_figure_arg). The data is only loaded when the figure is not cached, so it
+    is not part of the key: data_key must hold whatever, besides the arguments and the
+    version, decides the rows load_data returns.
+
+    Args:
+    - builder (callable): Figure builder taking the data as first argument, e.g. create_bar_chart_overview.
+    - version (str): Data version of the database, see data_version.
+    - load_data (callable): Returns the data of the builder.
+    - data_key (tuple, optional): Options of load_data not among the builder arguments.
+    - **kwargs: The other arguments of the builder.
+
+    Returns:
+    - go.Figure: A new figure, the caller can update it.
+    """
+    key = (builder.__name__, version, normalize_figure_arg(data_key), normalize_figure_arg(kwargs))
+    cache, disk = figure_cache(), disk_cache()
+    figure_json = cache.get(key)
+    if figure_json is None and disk is not None:
+        figure_json = disk.get_text(('figure',) + key)
+        if figure_json is not None:
+            cache.put(key, figure_json)
+    if figure_json is None:
+        figure_json = builder(load_data(), **kwargs).to_json()
+        cache.put(key, figure_json)
+        if disk is not None:
+            disk.put_text(('figure',) + key, figure_json)
+    # Already validated when built: validating again costs more than the build saves, and would
+    # turn the numbers of the bar texts into strings
+    return go.Figure(json.loads(figure_json), _validate=False)